@@ -1,9 +1,10 @@
 import json
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Sequence
 
 from anthropic import AsyncAnthropic
 
+from llm.stream_buffer import DEFAULT_FLUSH_CHARS, DEFAULT_FLUSH_MS, StreamBuffer
 from llm.tool_handling import prepare_tools_for_api
 from llm.tooling import ToolRegistry
 from llm.types import Message, LLMResponse, StreamHandler
@@ -16,7 +17,7 @@ async def handle_anthropic_api(
         user_input: Union[str, List[Message]],
         model: str,
         instructions: Optional[str],
-        tools: Optional[List[Dict[str, Any]]],
+        tools: Optional[Sequence[Dict[str, Any]]],
         tool_registry: ToolRegistry,
         temperature: float,
         max_tokens: int,
@@ -224,11 +225,13 @@ async def stream_anthropic_api(
         user_input: Union[str, List[Message]],
         model: str,
         instructions: Optional[str],
-        tools: Optional[List[Dict[str, Any]]],
+        tools: Optional[Sequence[Dict[str, Any]]],
         tool_registry: ToolRegistry,
         temperature: float,
         max_tokens: int,
         stream_handler: StreamHandler,
+        flush_chars: int = DEFAULT_FLUSH_CHARS,
+        flush_ms: float = DEFAULT_FLUSH_MS,
         **kwargs
 ) -> LLMResponse:
     """
@@ -244,6 +247,8 @@ async def stream_anthropic_api(
         temperature: Sampling temperature
         max_tokens: Maximum tokens to generate
         stream_handler: Callback function to handle each chunk of the stream
+        flush_chars: Number of buffered characters that triggers a call to stream_handler
+        flush_ms: Milliseconds since the last stream_handler call that trigger the next one
         **kwargs: Additional parameters to pass to Anthropic's API
 
     Returns:
@@ -320,23 +325,25 @@ async def stream_anthropic_api(
     output_tokens = 0
     response_id = None
 
-    async for chunk in with_stream:
-        if hasattr(chunk, 'type') and chunk.type == 'content_block_delta':
-            if hasattr(chunk, 'delta') and hasattr(chunk.delta, 'text'):
-                content = chunk.delta.text
-                full_text += content
-                await stream_handler(content)
-
-        # Get token usage from the chunk if available
-        if hasattr(chunk, 'usage'):
-            if hasattr(chunk.usage, 'input_tokens'):
-                input_tokens = chunk.usage.input_tokens
-            if hasattr(chunk.usage, 'output_tokens'):
-                output_tokens = chunk.usage.output_tokens
-
-        # Get response ID if available
-        if hasattr(chunk, 'message') and hasattr(chunk.message, 'id'):
-            response_id = chunk.message.id
+    # Coalesce small chunks before handing them to the stream handler; the rest is sent on exit
+    async with StreamBuffer(stream_handler, flush_chars, flush_ms) as buffer:
+        async for chunk in with_stream:
+            if hasattr(chunk, 'type') and chunk.type == 'content_block_delta':
+                if hasattr(chunk, 'delta') and hasattr(chunk.delta, 'text'):
+                    content = chunk.delta.text
+                    full_text += content
+                    await buffer.write(content)
+
+            # Get token usage from the chunk if available
+            if hasattr(chunk, 'usage'):
+                if hasattr(chunk.usage, 'input_tokens'):
+                    input_tokens = chunk.usage.input_tokens
+                if hasattr(chunk.usage, 'output_tokens'):
+                    output_tokens = chunk.usage.output_tokens
+
+            # Get response ID if available
+            if hasattr(chunk, 'message') and hasattr(chunk.message, 'id'):
+                response_id = chunk.message.id
 
     # If we didn't get token counts from streaming chunks, make a non-streaming call to get them
     if input_tokens == 0 or output_tokens == 0:
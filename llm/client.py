@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from typing import List, Optional, Dict, Any, Union, overload
+from typing import List, Optional, Dict, Any, Union, overload, Sequence
 
 from anthropic import AsyncAnthropic
 from openai import AsyncOpenAI
@@ -10,6 +10,7 @@ from openai.types.responses import ResponseFunctionToolCall
 
 from llm.anthropic import handle_anthropic_api, stream_anthropic_api
 from llm.chat_completions import handle_chat_completions_api, prepare_messages, stream_chat_completions_api
+from llm.connection_pool import create_http_client
 from llm.responses_api import handle_responses_api
 from llm.streaming_responses import stream_responses_api
 from llm.tooling import ToolRegistry
@@ -18,6 +19,24 @@ from llm.types import Message, LLMResponse, ModelProvider, ToolCallResponse, Str
 logger = logging.getLogger(__name__)
 
 
+def _create_openai_client(base_url: Optional[str], api_key: Optional[str]) -> AsyncOpenAI:
+    """
+    Create an OpenAI-compatible client that shares connections with other clients for the same endpoint.
+
+    Args:
+        base_url: Optional base URL for the API
+        api_key: API key for the endpoint
+
+    Returns:
+        The async OpenAI client
+    """
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        http_client=create_http_client(base_url, api_key)
+    )
+
+
 class AsyncLLMClient:
     """Async client for interacting with various LLM providers including OpenAI, Anthropic, and Ollama."""
 
@@ -37,7 +56,7 @@ class AsyncLLMClient:
             tool_registry: Optional tool registry for function calling
             max_tool_call_depth: Maximum depth for recursive tool calls
         """
-        self.openai_client = AsyncOpenAI(
+        self.openai_client = _create_openai_client(
             base_url=base_url,
             api_key=api_key or os.getenv("OPENAI_API_KEY")
         )
@@ -146,7 +165,7 @@ class AsyncLLMClient:
             user_input: str,
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -161,7 +180,7 @@ class AsyncLLMClient:
             user_input: List[Message],
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -175,7 +194,7 @@ class AsyncLLMClient:
             user_input: Union[str, List[Message]],
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -194,7 +213,8 @@ class AsyncLLMClient:
             max_tokens: Maximum tokens to generate
             use_responses_api: Whether to use OpenAI's responses API (vs. chat completions)
             stream_handler: Optional callback function to handle each chunk of the stream
-            **kwargs: Additional parameters to pass to the API
+            **kwargs: Additional parameters to pass to the API. flush_chars (default 4096) and
+                flush_ms (default 10) control how small chunks are batched before stream_handler is called
 
         Returns:
             LLMResponse object containing:
@@ -214,7 +234,7 @@ class AsyncLLMClient:
         provider: ModelProvider = self._detect_provider(model)
 
         # Get the appropriate tools for the model (but only if tools not explicitly provided)
-        provider_tools = None
+        provider_tools: Optional[Sequence[Dict[str, Any]]] = None
         if not tools:
             if provider == "anthropic":
                 provider_tools = self.tool_registry.get_schemas("anthropic") if self.tool_registry else None
@@ -251,7 +271,7 @@ class AsyncLLMClient:
                     # Configure client to use Ollama API endpoint if not already set
                     if not hasattr(self, '_using_ollama') or not self._using_ollama:
                         base_url = kwargs.get('base_url') or "http://localhost:11434/v1"
-                        self.openai_client = AsyncOpenAI(
+                        self.openai_client = _create_openai_client(
                             base_url=base_url,
                             api_key="ollama"  # Ollama doesn't require a real API key
                         )
@@ -272,6 +292,7 @@ class AsyncLLMClient:
                 else:
                     return await stream_chat_completions_api(
                         client=self.openai_client,
+                        tool_registry=self.tool_registry,
                         user_input=user_input,
                         model=model,
                         instructions=instructions,
@@ -293,7 +314,7 @@ class AsyncLLMClient:
             user_input: str,
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -307,7 +328,7 @@ class AsyncLLMClient:
             user_input: List[Message],
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -320,7 +341,7 @@ class AsyncLLMClient:
             user_input: Union[str, List[Message]],
             model: str = "gpt-4o-mini",
             instructions: Optional[str] = None,
-            tools: Optional[List[Dict[str, Any]]] = None,
+            tools: Optional[Sequence[Dict[str, Any]]] = None,
             temperature: float = 0.0,
             max_tokens: int = 4096,
             use_responses_api: bool = True,
@@ -339,7 +360,8 @@ class AsyncLLMClient:
             max_tokens: Maximum tokens to generate
             use_responses_api: Whether to use OpenAI's responses API (vs. chat completions)
             previous_response_id: ID of the previous response (only for OpenAI Responses API)
-            **kwargs: Additional parameters to pass to the API
+            **kwargs: Additional parameters to pass to the API. With the Responses API,
+                max_concurrent_tools limits how many tool calls from one response run at once
 
         Returns:
             LLMResponse object containing:
@@ -359,7 +381,7 @@ class AsyncLLMClient:
         provider: ModelProvider = self._detect_provider(model)
 
         # Get the appropriate tools for the model (but only if tools not explicitly provided)
-        provider_tools = None
+        provider_tools: Optional[Sequence[Dict[str, Any]]] = None
         if not tools:
             if provider == "anthropic":
                 provider_tools = self.tool_registry.get_schemas("anthropic") if self.tool_registry else None
@@ -392,7 +414,7 @@ class AsyncLLMClient:
                     # Configure client to use Ollama API endpoint if not already set
                     if not hasattr(self, '_using_ollama') or not self._using_ollama:
                         base_url = kwargs.get('base_url') or "http://localhost:11434/v1"
-                        self.openai_client = AsyncOpenAI(
+                        self.openai_client = _create_openai_client(
                             base_url=base_url,
                             api_key="ollama"  # Ollama doesn't require a real API key
                         )
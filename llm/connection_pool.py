@@ -0,0 +1,87 @@
+"""
+HTTP connections shared by OpenAI clients.
+
+Clients created for the same endpoint and API key on the same event loop send their requests over
+one connection pool, so creating a client per request doesn't pay for a new TCP and TLS handshake.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+from openai import DefaultAsyncHttpxClient
+
+# Pooled HTTP clients by event loop, then by (base_url, api_key). A loop's pools are dropped with it.
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], Optional[str]], DefaultAsyncHttpxClient]]" = \
+    weakref.WeakKeyDictionary()
+_pools_lock = threading.Lock()  # Guards _pools across threads running their own loops
+
+
+def _get_pool(key: Tuple[Optional[str], Optional[str]]) -> DefaultAsyncHttpxClient:
+    """Get the pooled HTTP client for key on the running event loop, creating it if needed."""
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        pools = _pools.get(loop)
+        if pools is None:
+            pools = _pools[loop] = {}
+        pool = pools.get(key)
+        if pool is None or pool.is_closed:
+            pool = pools[key] = DefaultAsyncHttpxClient()
+    return pool
+
+
+class SharedConnectionTransport:
+    """
+    HTTP transport that sends requests over the connection pool shared by its endpoint and API key.
+
+    The pool is looked up on the event loop running each request, so a client created outside a loop,
+    or used from several loops, never reuses a connection from another loop. Closing a client only
+    closes that client; the shared connections stay open for the others.
+    """
+
+    def __init__(self, base_url: Optional[str], api_key: Optional[str]) -> None:
+        """
+        Initialize the transport.
+
+        Args:
+            base_url: Base URL of the API the client talks to
+            api_key: API key the client uses
+        """
+        self._key = (base_url, api_key)
+
+    async def handle_async_request(self, request: Any) -> Any:
+        """
+        Send a request over the shared connections.
+
+        Args:
+            request: Request built by the client using this transport
+
+        Returns:
+            The streamed response
+        """
+        # The client using this transport already handles redirects and auth
+        return await _get_pool(self._key).send(request, stream=True, follow_redirects=False)
+
+    async def aclose(self) -> None:
+        """Leave the shared connections open for other clients."""
+
+    async def __aenter__(self) -> "SharedConnectionTransport":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.aclose()
+
+
+def create_http_client(base_url: Optional[str], api_key: Optional[str]) -> DefaultAsyncHttpxClient:
+    """
+    Create an HTTP client for an OpenAI client that uses the shared connections.
+
+    Args:
+        base_url: Base URL of the API
+        api_key: API key for the endpoint
+
+    Returns:
+        HTTP client to pass to AsyncOpenAI as http_client
+    """
+    return DefaultAsyncHttpxClient(transport=SharedConnectionTransport(base_url, api_key))
@@ -0,0 +1,119 @@
+"""
+Preemptive limiter for outgoing OpenAI API requests.
+
+Caps the number of requests in flight and, optionally, the number of requests started per minute,
+so bursts of tool rounds and parallel callers queue locally instead of running into 429s.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ApiLimiter:
+    """
+    Async context manager combining a concurrency semaphore with an optional token bucket.
+
+    Each event loop gets its own semaphore, created on first use, so a limiter created at import
+    time can be used from any loop. The concurrency limit applies per loop; the per-minute budget
+    is shared by all loops and threads.
+    """
+
+    def __init__(self, max_concurrency: int, max_rpm: Optional[int] = None) -> None:
+        """
+        Initialize the limiter.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight at once
+            max_rpm: Optional maximum number of requests started per minute
+        """
+        self._max_concurrency = max_concurrency
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()  # Guards the semaphores and the token bucket across threads
+
+        self._rate = max_rpm / 60 if max_rpm else None  # Tokens added per second
+        self._capacity = float(max_rpm) if max_rpm else 0.0
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self._max_concurrency)
+        return semaphore
+
+    def _reserve_token(self) -> float:
+        """
+        Take a request from the token bucket if one is available.
+
+        Returns:
+            0 if a request was taken, otherwise the number of seconds to wait before trying again
+        """
+        rate = self._rate
+        assert rate is not None  # Only called for limiters with a per-minute budget
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * rate)
+            self._last_refill = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / rate
+
+    async def _take_token(self) -> None:
+        """Wait until the token bucket has a request available and take it."""
+        while True:
+            delay = self._reserve_token()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self) -> "ApiLimiter":
+        # A task never changes loops, so __aexit__ finds the same semaphore for the running loop
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        if self._rate is not None:
+            try:
+                await self._take_token()
+            except BaseException:
+                semaphore.release()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._get_semaphore().release()
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    """Read a positive integer setting from the environment, falling back to the default if it is invalid."""
+    value = os.getenv(name)
+    if not value:
+        return default
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        logger.warning("Ignoring invalid %s=%r, using %s", name, value, default)
+        return default
+    return number
+
+
+# Shared by every OpenAI-compatible request made by this package
+api_limiter = ApiLimiter(
+    max_concurrency=_env_int("LLM_MAX_CONCURRENCY", 8),
+    max_rpm=_env_int("LLM_MAX_RPM", None)
+)
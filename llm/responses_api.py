@@ -1,9 +1,11 @@
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, FrozenSet, Union, Optional, Sequence
 
 from openai import AsyncOpenAI
 
+from llm.rate_limit import api_limiter
 from llm.tool_handling import extract_tool_info, prepare_tools_for_api
 from llm.tooling import ToolRegistry
 from llm.types import Message, LLMResponse
@@ -11,44 +13,206 @@ from llm.types import Message, LLMResponse
 logger = logging.getLogger(__name__)
 
 
-def extract_cited_files(response_output):
-    cited_files = []
-
-    # Iterate through response items
+def _iter_citation_annotations(response_output):
+    """Yield the file_citation annotations found in a response's output items."""
+    # Use getattr defaults rather than hasattr + attribute access: one lookup per attribute
     for item in response_output:
-        # Check if it's a message item with content
-        if hasattr(item, 'content') and item.content:
-            # Iterate through content items (which may contain annotations)
-            for content_item in item.content:
-                # Check if the content item has annotations
-                if hasattr(content_item, 'annotations') and content_item.annotations:
-                    # Iterate through annotations
-                    for annotation in content_item.annotations:
-                        # Check if it's a file citation annotation
-                        if hasattr(annotation, 'type') and annotation.type == 'file_citation':
-                            # Add file information to our list
-                            cited_files.append({
-                                'file_id': annotation.file_id,
-                                'filename': annotation.filename,
-                                'index': annotation.index
-                            })
-
-    return cited_files
+        # Only message items carry content
+        content = getattr(item, 'content', None)
+        if not content:
+            continue
+        for content_item in content:
+            # Content items may carry annotations
+            annotations = getattr(content_item, 'annotations', None)
+            if not annotations:
+                continue
+            for annotation in annotations:
+                if getattr(annotation, 'type', None) == 'file_citation':
+                    yield annotation
+
+
+def extract_cited_files(response_output):
+    if not response_output:
+        return []
+
+    return [
+        {
+            'file_id': annotation.file_id,
+            'filename': annotation.filename,
+            'index': annotation.index
+        }
+        for annotation in _iter_citation_annotations(response_output)
+    ]
 
 
 # If you only want the filenames:
 def extract_filenames(response_output):
-    filenames = []
+    if not response_output:
+        return []
+
+    return [annotation.filename for annotation in _iter_citation_annotations(response_output)]
 
-    for item in response_output:
-        if hasattr(item, 'content') and item.content:
-            for content_item in item.content:
-                if hasattr(content_item, 'annotations') and content_item.annotations:
-                    for annotation in content_item.annotations:
-                        if hasattr(annotation, 'type') and annotation.type == 'file_citation':
-                            filenames.append(annotation.filename)
 
-    return filenames
+async def _execute_function_call(tool_registry: ToolRegistry, function_call: Any) -> Dict[str, Any]:
+    """Execute a single Responses API function call and return its tool output, keyed by the original call ID."""
+    try:
+        function_name = function_call.name
+        arguments_json = function_call.arguments
+        function_id = function_call.call_id
+
+        logger.info("Handling function call: %s with ID %s", function_name, function_id)
+
+        if not tool_registry.has_tool(function_name):
+            error_message = f"Error: Tool '{function_name}' not found in registry"
+            logger.error(error_message)
+            return {
+                "id": function_id,
+                "output": error_message
+            }
+
+        try:
+            # Parse arguments
+            args = json.loads(arguments_json)
+
+            # Execute tool
+            result = await tool_registry.execute_tool(function_name, args)
+
+            # Format result
+            if isinstance(result, dict):
+                formatted_result = json.dumps(result)
+            else:
+                formatted_result = str(result)
+
+            logger.info("Tool processed: %s", function_name)
+            return {
+                "id": function_id,
+                "output": formatted_result
+            }
+
+        except json.JSONDecodeError as e:
+            error_message = f"Invalid JSON arguments for tool {function_name}: {e}"
+            logger.error(error_message)
+            return {
+                "id": function_id,
+                "output": error_message
+            }
+        except Exception as e:
+            error_message = f"Error executing tool {function_name}: {str(e)}"
+            logger.error("%s\nArguments: %s", error_message, arguments_json)
+            return {
+                "id": function_id,
+                "output": error_message
+            }
+    except Exception as e:
+        error_message = f"Unexpected error processing function call: {str(e)}"
+        logger.error(error_message)
+        return {
+            "id": getattr(function_call, 'call_id', 'unknown'),
+            "output": error_message
+        }
+
+
+def _has_system_message(user_input: Union[str, List[Message]]) -> bool:
+    """
+    Check whether the input messages already include a system message.
+
+    Args:
+        user_input: Either a string or a list of message objects
+
+    Returns:
+        True if a system message is present
+    """
+    if isinstance(user_input, str):
+        return False
+
+    # A plain loop with an early exit is cheaper than any() over a generator for short lists
+    for msg in user_input:
+        if isinstance(msg, dict) and msg.get("role") == "system":
+            return True
+    return False
+
+
+# Caller parameters that are handled separately instead of being passed to the API
+_EXCLUDED_PARAMS = frozenset(('tool_outputs',))
+
+
+def _build_responses_params(
+        model: str,
+        user_input: Union[str, List[Message]],
+        instructions: Optional[str],
+        prepared_tools: Optional[List[Dict[str, Any]]],
+        temperature: float,
+        max_tokens: int,
+        extra_params: Dict[str, Any],
+        previous_response_id: Optional[str] = None,
+        tool_outputs: Optional[List[Dict[str, Any]]] = None,
+        *,
+        stream: bool = False,
+        exclude: FrozenSet[str] = _EXCLUDED_PARAMS
+) -> Dict[str, Any]:
+    """
+    Build the request parameters for a single Responses API call.
+
+    Args:
+        model: Model identifier
+        user_input: Either a string or a list of message objects
+        instructions: Instructions to send, if any
+        prepared_tools: Tools already formatted for the Responses API
+        temperature: Temperature setting
+        max_tokens: Maximum number of output tokens
+        extra_params: Additional request parameters passed by the caller
+        previous_response_id: ID of the previous response, for conversation continuity
+        tool_outputs: Tool outputs to send as function_call_output input messages
+        stream: Whether to request a streaming response
+        exclude: Keys of extra_params that must not be sent as request parameters
+
+    Returns:
+        The request parameters
+    """
+    response_params = {
+        "model": model,
+        "input": user_input,
+        "temperature": temperature,
+        "max_output_tokens": max_tokens,
+        **{k: v for k, v in extra_params.items() if k not in exclude}
+    }
+
+    if stream:
+        response_params["stream"] = True
+
+    # Add tools if provided, already formatted for Responses API
+    if prepared_tools:
+        response_params["tools"] = prepared_tools
+
+    # Add instructions if provided
+    if instructions:
+        response_params["instructions"] = instructions
+
+    # Add previous_response_id if it's provided (for maintaining conversation context)
+    if previous_response_id:
+        response_params["previous_response_id"] = previous_response_id
+
+    # Add tool outputs to the input as function_call_output messages
+    if tool_outputs:
+        logger.info("Including %d tool outputs in request", len(tool_outputs))
+
+        output_messages = [
+            {
+                "type": "function_call_output",
+                "call_id": output.get("id", output.get("tool_call_id")),
+                "output": output.get("output")
+            }
+            for output in tool_outputs
+        ]
+
+        # Build a new list in one concatenation so the original input isn't modified;
+        # string input becomes a user message
+        if isinstance(user_input, str):
+            response_params["input"] = [{"role": "user", "content": user_input}] + output_messages
+        else:
+            response_params["input"] = list(user_input) + output_messages
+
+    return response_params
 
 
 async def handle_responses_api(
@@ -57,18 +221,19 @@ async def handle_responses_api(
         user_input: Union[str, List[Message]],
         model: str,
         instructions: Optional[str],
-        tools: Optional[List[Dict[str, Any]]],
+        tools: Optional[Sequence[Dict[str, Any]]],
         temperature: float,
         max_tokens: int,
         previous_response_id: Optional[str] = None,
         current_tool_call_depth: int = 0,
         max_tool_call_depth: int = 3,
+        max_concurrent_tools: Optional[int] = None,
         **kwargs
 ) -> LLMResponse:
     """Handle interactions with OpenAI's Responses API including tool calling."""
     # Check if we've reached the maximum tool call depth
     if current_tool_call_depth > max_tool_call_depth:
-        logger.warning(f"Maximum tool call depth ({max_tool_call_depth}) reached. Stopping recursion.")
+        logger.warning("Maximum tool call depth (%d) reached. Stopping recursion.", max_tool_call_depth)
         return {
             "text": "I've reached the maximum number of tool calls I can make for this request. Please provide more specific instructions if needed.",
             "input_tokens": 0,
@@ -77,191 +242,73 @@ async def handle_responses_api(
             "sources": [],
         }
 
-    # Prepare request parameters for Responses API
-    if isinstance(user_input, str):
-        response_params = {
-            "model": model,
-            "input": user_input,
-            "temperature": temperature,
-            "max_output_tokens": max_tokens,
-            **{k: v for k, v in kwargs.items() if k not in ['tool_outputs']}  # Filter out unsupported params
-        }
-
-        # Add tools if provided, properly formatted for Responses API
-        if tools:
-            response_params["tools"] = prepare_tools_for_api(tools, 'responses')
-
-        # Add instructions if provided
-        if instructions:
-            response_params["instructions"] = instructions
-
-    else:
-        response_params = {
-            "model": model,
-            "input": user_input,
-            "temperature": temperature,
-            "max_output_tokens": max_tokens,
-            **{k: v for k, v in kwargs.items() if k not in ['tool_outputs']}  # Filter out unsupported params
-        }
-
-        # Add tools if provided
-        if tools:
-            response_params["tools"] = tools
-
-        # Add instructions if provided and not in messages
-        if instructions and not any(isinstance(msg, dict) and msg.get("role") == "system" for msg in user_input):
-            response_params["instructions"] = instructions
-
-    # Add previous_response_id if it's provided (for maintaining conversation context)
-    if previous_response_id:
-        response_params["previous_response_id"] = previous_response_id
-
-    # Handle tool outputs if present by transforming them to a format the API expects
-    if 'tool_outputs' in kwargs:
-        # Check if we have any tool outputs to include
-        tool_outputs = kwargs.get('tool_outputs')
-        if tool_outputs:
-            logger.info(f"Including {len(tool_outputs)} tool outputs in request")
-
-            # Add each tool output to the input message array
-            if isinstance(user_input, str):
-                # Convert string input to message array to add tool results
-                input_messages = [{"role": "user", "content": user_input}]
-
-                # Add tool results as function_call_output type messages
-                for output in tool_outputs:
-                    input_messages.append({
-                        "type": "function_call_output",
-                        "call_id": output.get("id", output.get("tool_call_id")),
-                        "output": output.get("output")
-                    })
-
-                # Update input parameter
-                response_params["input"] = input_messages
-            else:
-                # Add tool results to existing message array
-                input_messages = list(user_input)  # Make a copy to avoid modifying original
-
-                # Add tool results as function_call_output type messages
-                for output in tool_outputs:
-                    input_messages.append({
-                        "type": "function_call_output",
-                        "call_id": output.get("id", output.get("tool_call_id")),
-                        "output": output.get("output")
-                    })
-
-                # Update input parameter
-                response_params["input"] = input_messages
-
-    logger.info(f"Making Responses API call with params: {response_params}")
-    response = await client.responses.create(**response_params)
-
-    # Check for function call tool calls in the response
-    # We need to filter to only process function calls, NOT internal tools like file_search
-    function_calls = []
-    for item in response.output:
-        tool_info = extract_tool_info(item)
-        if tool_info['name'] and item.type == "function_call" and not tool_registry.is_internal_tool(item.type):
-            function_calls.append(item)
-
-    # If we have function calls and haven't reached max depth, process them
-    if function_calls and current_tool_call_depth < max_tool_call_depth:
-        logger.info(f"Processing function calls at depth {current_tool_call_depth + 1}/{max_tool_call_depth}")
-
-        # Process function calls with original IDs
-        tool_outputs = []
-
-        for function_call in function_calls:
-            try:
-                function_name = function_call.name
-                arguments_json = function_call.arguments
-                function_id = function_call.call_id
-
-                logger.info(f"Handling function call: {function_name} with ID {function_id}")
-
-                if not tool_registry.has_tool(function_name):
-                    error_message = f"Error: Tool '{function_name}' not found in registry"
-                    logger.error(error_message)
-                    tool_outputs.append({
-                        "id": function_id,
-                        "output": error_message
-                    })
-                    continue
-
-                try:
-                    # Parse arguments
-                    args = json.loads(arguments_json)
-
-                    # Execute tool
-                    result = await tool_registry.execute_tool(function_name, args)
-
-                    # Format result
-                    if isinstance(result, dict):
-                        formatted_result = json.dumps(result)
-                    else:
-                        formatted_result = str(result)
-
-                    # Add to tool outputs using the original ID
-                    tool_outputs.append({
-                        "id": function_id,
-                        "output": formatted_result
-                    })
-                    logger.info(f"Tool processed: {function_name}")
-
-                except json.JSONDecodeError as e:
-                    error_message = f"Invalid JSON arguments for tool {function_name}: {e}"
-                    logger.error(error_message)
-                    tool_outputs.append({
-                        "id": function_id,
-                        "output": error_message
-                    })
-                except Exception as e:
-                    error_message = f"Error executing tool {function_name}: {str(e)}"
-                    logger.error(f"{error_message}\nArguments: {arguments_json}")
-                    tool_outputs.append({
-                        "id": function_id,
-                        "output": error_message
-                    })
-            except Exception as e:
-                error_message = f"Unexpected error processing function call: {str(e)}"
-                logger.error(error_message)
-                function_id = getattr(function_call, 'call_id', 'unknown')
-                tool_outputs.append({
-                    "id": function_id,
-                    "output": error_message
-                })
-
-        # If we have tool outputs, make a recursive call to continue the conversation
-        if tool_outputs:
-            logger.info(f"Continuing conversation with {len(tool_outputs)} tool outputs")
-
-            # Make a follow-up call to continue the conversation with tool outputs
-            # Important: Pass tool_outputs in kwargs to let the function handle them properly
-            # Check if include is already in kwargs to avoid duplication
-            additional_kwargs = {k: v for k, v in kwargs.items() if k != 'tool_outputs'}
-
-            # Only add include if it's not already present in the kwargs
-            if 'include' not in additional_kwargs:
-                additional_kwargs['include'] = ["file_search_call.results"]
-                
-            return await handle_responses_api(
-                client=client,
-                tool_registry=tool_registry,
-                user_input=user_input,  # Keep the original input
-                model=model,
-                instructions=instructions,
-                tools=tools,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                previous_response_id=response.id,  # Important: use the response ID for continuity
-                current_tool_call_depth=current_tool_call_depth + 1,
-                max_tool_call_depth=max_tool_call_depth,
-                tool_outputs=tool_outputs,  # Add tool outputs via kwargs
-                **additional_kwargs  # Pass through other kwargs
-            )
+    # Tools and instructions don't change between tool rounds, so prepare them once
+    prepared_tools = prepare_tools_for_api(tools, 'responses') if tools else None
+
+    # Instructions are only sent when the messages don't already include a system message
+    if instructions and _has_system_message(user_input):
+        instructions = None
+
+    # Tool outputs are sent as input messages, not as a request parameter
+    tool_outputs = kwargs.pop('tool_outputs', None)
+
+    # Whether function calls are treated as internal tools doesn't change between rounds
+    skip_function_calls = tool_registry.is_internal_tool("function_call")
+
+    # Run function calls concurrently, optionally bounded by max_concurrent_tools;
+    # gather keeps the outputs in the same order as the calls
+    semaphore = asyncio.Semaphore(max_concurrent_tools) if max_concurrent_tools else None
+
+    async def run_function_call(function_call: Any) -> Dict[str, Any]:
+        if semaphore is None:
+            return await _execute_function_call(tool_registry, function_call)
+        async with semaphore:
+            return await _execute_function_call(tool_registry, function_call)
+
+    while True:
+        response_params = _build_responses_params(
+            model=model,
+            user_input=user_input,  # Keep the original input
+            instructions=instructions,
+            prepared_tools=prepared_tools,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            extra_params=kwargs,
+            previous_response_id=previous_response_id,
+            tool_outputs=tool_outputs
+        )
+
+        # The params can be large (messages, tool schemas), so skip formatting them when INFO is off
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Making Responses API call with params: %s", response_params)
+        async with api_limiter:
+            response = await client.responses.create(**response_params)
+
+        # Check for function call tool calls in the response
+        # We need to filter to only process function calls, NOT internal tools like file_search;
+        # the cheap type check runs first so extract_tool_info only sees function calls
+        function_calls = [] if skip_function_calls else [
+            item for item in response.output
+            if getattr(item, 'type', None) == "function_call" and extract_tool_info(item).name
+        ]
+
+        # Stop if there are no function calls or we've reached max depth
+        if not function_calls or current_tool_call_depth >= max_tool_call_depth:
+            break
+
+        logger.info("Processing function calls at depth %d/%d", current_tool_call_depth + 1, max_tool_call_depth)
+        tool_outputs = list(await asyncio.gather(*(run_function_call(fc) for fc in function_calls)))
+
+        # Continue the conversation with the tool outputs in the next round
+        logger.info("Continuing conversation with %d tool outputs", len(tool_outputs))
+        previous_response_id = response.id  # Important: use the response ID for continuity
+        current_tool_call_depth += 1
+
+        # Follow-up rounds include file search results unless the caller already chose what to include
+        if 'include' not in kwargs:
+            kwargs['include'] = ["file_search_call.results"]
 
     # If no tool calls or max depth reached, return the response as is
-
     return {
         "text": response.output_text,
         "input_tokens": response.usage.input_tokens,
@@ -0,0 +1,141 @@
+"""
+Coalescing buffer for stream handler callbacks.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import List, Optional, Set
+
+from llm.types import StreamHandler
+
+# Default thresholds for flushing buffered stream text to the handler
+DEFAULT_FLUSH_CHARS = 4096
+DEFAULT_FLUSH_MS = 10.0
+
+
+class StreamBuffer:
+    """
+    Collects small stream chunks and passes them to a stream handler in batches.
+
+    The first chunk is flushed immediately to keep time-to-first-token low. After that, text is
+    flushed once the buffer holds flush_chars characters or flush_ms milliseconds after the
+    previous flush, even if no further chunk arrives. Both sync and async handlers are supported.
+
+    Use it as an async context manager around the stream loop: remaining text is flushed when the
+    block exits normally, and pending flushes are cancelled when it exits with an exception.
+    """
+
+    def __init__(
+            self,
+            stream_handler: StreamHandler,
+            flush_chars: int = DEFAULT_FLUSH_CHARS,
+            flush_ms: float = DEFAULT_FLUSH_MS
+    ) -> None:
+        """
+        Initialize the buffer.
+
+        Args:
+            stream_handler: Callback that receives the buffered text
+            flush_chars: Number of buffered characters that triggers a flush
+            flush_ms: Milliseconds since the previous flush that trigger a flush
+        """
+        self._stream_handler = stream_handler
+        self._flush_chars = flush_chars
+        self._flush_interval = flush_ms / 1000
+        self._parts: List[str] = []
+        self._size = 0
+        self._last_flush = 0.0
+        self._flushed = False
+        self._lock = asyncio.Lock()  # Keeps handler calls in order when a timed flush overlaps another
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timed_flushes: Set["asyncio.Task[None]"] = set()
+
+    async def __aenter__(self) -> "StreamBuffer":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.cancel()
+
+    async def write(self, text: str) -> None:
+        """
+        Add text to the buffer, flushing it to the handler when a threshold is reached.
+
+        If no threshold is reached, a flush is scheduled for flush_ms after the previous one.
+
+        Args:
+            text: Text chunk received from the stream
+        """
+        self._raise_timed_flush_error()
+
+        self._parts.append(text)
+        self._size += len(text)
+
+        if (not self._flushed
+                or self._size >= self._flush_chars
+                or time.monotonic() - self._last_flush >= self._flush_interval):
+            await self.flush()
+        elif self._timer is None:
+            delay = self._last_flush + self._flush_interval - time.monotonic()
+            self._timer = asyncio.get_running_loop().call_later(delay, self._start_timed_flush)
+
+    async def flush(self) -> None:
+        """Pass any buffered text to the handler, including text held for a scheduled flush."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Wait for timed flushes that already started so their text goes out first
+        while self._timed_flushes:
+            task = self._timed_flushes.pop()
+            await task
+
+        await self._flush()
+
+    def cancel(self) -> None:
+        """Drop buffered text and cancel any scheduled or running timed flush."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        for task in self._timed_flushes:
+            if task.done():
+                # Retrieve the outcome so a failed flush isn't reported as never retrieved
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
+        self._timed_flushes.clear()
+
+        self._parts.clear()
+        self._size = 0
+
+    def _start_timed_flush(self) -> None:
+        """Timer callback that flushes the buffer in a task."""
+        self._timer = None
+        self._timed_flushes.add(asyncio.ensure_future(self._flush()))
+
+    def _raise_timed_flush_error(self) -> None:
+        """Drop finished timed flushes, raising the handler error of any that failed."""
+        for task in [task for task in self._timed_flushes if task.done()]:
+            self._timed_flushes.discard(task)
+            task.result()
+
+    async def _flush(self) -> None:
+        """Pass the buffered text to the handler."""
+        async with self._lock:
+            if not self._parts:
+                return
+
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            self._flushed = True
+            self._last_flush = time.monotonic()
+
+            result = self._stream_handler(text)
+            if inspect.isawaitable(result):
+                await result
@@ -1,9 +1,12 @@
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Sequence
 
 from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletionChunk
 
+from llm.rate_limit import api_limiter
+from llm.stream_buffer import DEFAULT_FLUSH_CHARS, DEFAULT_FLUSH_MS, StreamBuffer
+from llm.token_counting import count_input_tokens, count_tokens, load_encoding
 from llm.types import Message, LLMResponse, StreamHandler
 
 
@@ -15,10 +18,12 @@ async def stream_chat_completions_api(
         user_input: Union[str, List[Message]],
         model: str,
         instructions: Optional[str],
-        tools: Optional[List[Dict[str, Any]]],
+        tools: Optional[Sequence[Dict[str, Any]]],
         temperature: float,
         max_tokens: int,
         stream_handler: StreamHandler,
+        flush_chars: int = DEFAULT_FLUSH_CHARS,
+        flush_ms: float = DEFAULT_FLUSH_MS,
         **kwargs
 ) -> LLMResponse:
     """Stream responses from OpenAI's Chat Completions API."""
@@ -36,6 +41,7 @@ async def stream_chat_completions_api(
         "temperature": temperature,
         "max_tokens": max_tokens,
         "stream": True,  # Enable streaming
+        "stream_options": {"include_usage": True},  # Report exact usage in the final chunk
         **{k: v for k, v in kwargs.items() if k not in ['tools']}  # Remove any tools from kwargs
     }
     
@@ -44,49 +50,48 @@ async def stream_chat_completions_api(
         completion_params["tools"] = api_tools
     
     # Make the API call with streaming
-    logger.info(f"Making streaming Chat Completions API call")
-    stream = await client.chat.completions.create(**completion_params)
+    logger.info("Making streaming Chat Completions API call")
+    async with api_limiter:
+        stream = await client.chat.completions.create(**completion_params)
     
     # Process the stream
-    full_text = ""
+    text_parts: List[str] = []  # Joined once at the end instead of repeated string concatenation
     input_tokens = 0
     output_tokens = 0
     
-    async for chunk in stream:
-        chunk: ChatCompletionChunk
-        if chunk.choices and len(chunk.choices) > 0:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                full_text += content
-                await stream_handler(content)
-                
-            # Update token counts
-            if hasattr(chunk, 'usage') and chunk.usage:
-                if chunk.usage.prompt_tokens:
-                    input_tokens = chunk.usage.prompt_tokens
-                if chunk.usage.completion_tokens:
-                    output_tokens = chunk.usage.completion_tokens
-    
-    # If we didn't get token counts from streaming chunks, estimate them
+    # Coalesce small chunks before handing them to the stream handler; the rest is sent on exit
+    async with StreamBuffer(stream_handler, flush_chars, flush_ms) as buffer:
+        async for chunk in stream:
+            chunk: ChatCompletionChunk
+            # Bind each attribute once per chunk
+            choices = chunk.choices
+            if choices:
+                content = getattr(choices[0].delta, 'content', None)
+                if content:
+                    text_parts.append(content)
+                    await buffer.write(content)
+
+            # Update token counts if available
+            usage = getattr(chunk, 'usage', None)
+            if usage:
+                prompt_tokens = getattr(usage, 'prompt_tokens', None)
+                if prompt_tokens:
+                    input_tokens = prompt_tokens
+                completion_tokens = getattr(usage, 'completion_tokens', None)
+                if completion_tokens:
+                    output_tokens = completion_tokens
+
+    full_text = "".join(text_parts)
+
+    # If we didn't get token counts from streaming chunks, count them locally
+    # rather than paying for another API call
     if input_tokens == 0 or output_tokens == 0:
-        # Make a non-streaming call to get token counts
-        # This is a fallback and isn't ideal, but OpenAI doesn't always
-        # include usage info in streaming responses
-        try:
-            completion_params["stream"] = False
-            # Use a more meaningful minimum token value - OpenAI's minimum is 16
-            completion_params["max_tokens"] = 16  # Minimize token usage for this call
-            non_stream_resp = await client.chat.completions.create(**completion_params)
-            input_tokens = non_stream_resp.usage.prompt_tokens
-            # We can't get an accurate output token count this way, so estimate based on text length
-            # This is very rough but better than nothing
-            output_tokens = len(full_text) // 4  # Rough estimate: ~4 chars per token
-        except Exception as e:
-            logger.warning(f"Failed to estimate token counts: {e}")
-            # Fallback to very rough estimates
-            input_tokens = sum(len(m.get("content", "")) for m in messages) // 4
-            output_tokens = len(full_text) // 4
-    
+        await load_encoding(model)
+    if input_tokens == 0:
+        input_tokens = count_input_tokens(messages, model)
+    if output_tokens == 0:
+        output_tokens = count_tokens(full_text, model)
+
     return {
         "text": full_text,
         "input_tokens": input_tokens,
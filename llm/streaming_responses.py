@@ -3,126 +3,120 @@ Functions for handling streaming with OpenAI Responses API.
 """
 
 import logging
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Union, List, Sequence
 
 from openai import AsyncOpenAI
 
+from llm.rate_limit import api_limiter
+from llm.stream_buffer import DEFAULT_FLUSH_CHARS, DEFAULT_FLUSH_MS, StreamBuffer
+from llm.token_counting import count_input_tokens, count_tokens, load_encoding
 from llm.tool_handling import prepare_tools_for_api
 from llm.types import Message, LLMResponse, StreamHandler
-from llm.responses_api import extract_cited_files
+from llm.responses_api import _build_responses_params, _has_system_message, _iter_citation_annotations
 
 logger = logging.getLogger(__name__)
 
+# Stream event types that only carry text, so citation extraction can be skipped
+_DELTA_EVENT_TYPES = frozenset(('response.output_text.delta',))
+
 
 async def stream_responses_api(
         client: AsyncOpenAI,
         user_input: Union[str, List[Message]],
         model: str,
         instructions: Optional[str],
-        tools: Optional[List[Dict[str, Any]]],
+        tools: Optional[Sequence[Dict[str, Any]]],
         temperature: float,
         max_tokens: int,
         stream_handler: StreamHandler,
+        flush_chars: int = DEFAULT_FLUSH_CHARS,
+        flush_ms: float = DEFAULT_FLUSH_MS,
         **kwargs
 ) -> LLMResponse:
     """Stream responses from OpenAI's Responses API."""
-    # Prepare request parameters for Responses API
-    if isinstance(user_input, str):
-        response_params = {
-            "model": model,
-            "input": user_input,
-            "temperature": temperature,
-            "max_output_tokens": max_tokens,
-            "stream": True,  # Enable streaming
-            **{k: v for k, v in kwargs.items() if k not in ['tool_outputs']}
-        }
-
-        # Add tools if provided, properly formatted for Responses API
-        if tools:
-            response_params["tools"] = prepare_tools_for_api(tools, 'responses')
-
-        # Add instructions if provided
-        if instructions:
-            response_params["instructions"] = instructions
+    # Instructions are only sent when the messages don't already include a system message
+    if instructions and _has_system_message(user_input):
+        instructions = None
 
-    else:
-        response_params = {
-            "model": model,
-            "input": user_input,
-            "temperature": temperature,
-            "max_output_tokens": max_tokens,
-            "stream": True,  # Enable streaming
-            **{k: v for k, v in kwargs.items() if k not in ['tool_outputs']}
-        }
-
-        # Add tools if provided
-        if tools:
-            response_params["tools"] = tools
-
-        # Add instructions if provided and not in messages
-        if instructions and not any(isinstance(msg, dict) and msg.get("role") == "system" for msg in user_input):
-            response_params["instructions"] = instructions
+    # Prepare request parameters for Responses API
+    response_params = _build_responses_params(
+        model=model,
+        user_input=user_input,
+        instructions=instructions,
+        prepared_tools=prepare_tools_for_api(tools, 'responses') if tools else None,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        extra_params=kwargs,
+        stream=True
+    )
 
     # Make the API call with streaming
-    logger.info(f"Making streaming Responses API call")
-    stream = await client.responses.create(**response_params)
+    logger.info("Making streaming Responses API call")
+    async with api_limiter:
+        stream = await client.responses.create(**response_params)
     
     # Process the stream
-    full_text = ""
+    text_parts: List[str] = []  # Joined once at the end instead of repeated string concatenation
     input_tokens = 0
     output_tokens = 0
     response_id = None
     sources = []
+    seen_sources = set()  # (file_id, index) keys of citations already collected
     
-    async for chunk in stream:
-        # Get text chunks
-        if hasattr(chunk, 'choices') and chunk.choices:
-            for choice in chunk.choices:
-                if hasattr(choice, 'delta') and hasattr(choice.delta, 'text'):
-                    content = choice.delta.text
+    # Coalesce small chunks before handing them to the stream handler; the rest is sent on exit
+    async with StreamBuffer(stream_handler, flush_chars, flush_ms) as buffer:
+        async for chunk in stream:
+            # Get text chunks, binding each attribute once
+            choices = getattr(chunk, 'choices', None)
+            if choices:
+                for choice in choices:
+                    content = getattr(getattr(choice, 'delta', None), 'text', None)
                     if content:
-                        full_text += content
-                        await stream_handler(content)
-        
-        # Get usage information
-        if hasattr(chunk, 'usage'):
-            if hasattr(chunk.usage, 'input_tokens'):
-                input_tokens = chunk.usage.input_tokens
-            if hasattr(chunk.usage, 'output_tokens'):
-                output_tokens = chunk.usage.output_tokens
-        
-        # Get response ID
-        if hasattr(chunk, 'id') and chunk.id:
-            response_id = chunk.id
-        
-        # Collect file citations
-        if hasattr(chunk, 'output'):
-            file_citations = extract_cited_files(chunk.output)
-            if file_citations:
-                for citation in file_citations:
-                    if citation not in sources:
-                        sources.append(citation)
+                        text_parts.append(content)
+                        await buffer.write(content)
+
+            # Get usage information
+            usage = getattr(chunk, 'usage', None)
+            if usage:
+                usage_input_tokens = getattr(usage, 'input_tokens', None)
+                if usage_input_tokens:
+                    input_tokens = usage_input_tokens
+                usage_output_tokens = getattr(usage, 'output_tokens', None)
+                if usage_output_tokens:
+                    output_tokens = usage_output_tokens
+
+            # Get response ID
+            chunk_id = getattr(chunk, 'id', None)
+            if chunk_id:
+                response_id = chunk_id
+
+            # Collect file citations; text delta events never carry them
+            if getattr(chunk, 'type', None) in _DELTA_EVENT_TYPES:
+                continue
+            output = getattr(chunk, 'output', None)
+            if output:
+                for annotation in _iter_citation_annotations(output):
+                    # Only build the citation dict the first time we see it
+                    key = (annotation.file_id, annotation.index)
+                    if key not in seen_sources:
+                        seen_sources.add(key)
+                        sources.append({
+                            'file_id': annotation.file_id,
+                            'filename': annotation.filename,
+                            'index': annotation.index
+                        })
     
-    # If we didn't get token counts from streaming chunks, estimate them
+    full_text = "".join(text_parts)
+
+    # If we didn't get token counts from streaming chunks, count them locally
+    # rather than paying for another API call
     if input_tokens == 0 or output_tokens == 0:
-        try:
-            # Make a non-streaming call with minimal tokens to get usage info
-            response_params["stream"] = False
-            # Use a more meaningful minimum token value - OpenAI's minimum is 16
-            response_params["max_output_tokens"] = 16
-            non_stream_resp = await client.responses.create(**response_params)
-            input_tokens = non_stream_resp.usage.input_tokens
-            # Estimate output tokens based on text length
-            output_tokens = len(full_text) // 4  # Rough estimate: ~4 chars per token
-        except Exception as e:
-            logger.warning(f"Failed to estimate token counts: {e}")
-            # Fallback to very rough estimates
-            if isinstance(user_input, str):
-                input_tokens = len(user_input) // 4
-            else:
-                input_tokens = sum(len(m.get("content", "")) for m in user_input if isinstance(m, dict)) // 4
-            output_tokens = len(full_text) // 4
-    
+        await load_encoding(model)
+    if input_tokens == 0:
+        input_tokens = count_input_tokens(user_input, model)
+    if output_tokens == 0:
+        output_tokens = count_tokens(full_text, model)
+
     return {
         "text": full_text,
         "input_tokens": input_tokens,
@@ -0,0 +1,101 @@
+"""
+Local token counting for streams that don't report usage.
+
+Uses tiktoken when it is installed and falls back to a rough character-based estimate otherwise.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, List, Union
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is an optional dependency
+    tiktoken = None
+
+from llm.types import Message
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=32)
+def _get_encoding(model: str) -> Any:
+    """
+    Get the tiktoken encoding for a model.
+
+    Args:
+        model: Model identifier
+
+    Returns:
+        The encoding, or None if tiktoken is unavailable or the encoding can't be loaded
+    """
+    if tiktoken is None:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Models tiktoken doesn't know about (e.g. Ollama models) get a general-purpose encoding
+        pass
+    except Exception as e:
+        logger.warning("Failed to load tiktoken encoding for %s: %s", model, e)
+        return None
+
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Failed to load tiktoken fallback encoding: %s", e)
+        return None
+
+
+async def load_encoding(model: str) -> None:
+    """
+    Load the tiktoken encoding for a model without blocking the event loop.
+
+    tiktoken downloads an encoding the first time it is used, so async callers load it in a worker
+    thread before counting; later lookups are served from the cache.
+
+    Args:
+        model: Model identifier
+    """
+    await asyncio.get_running_loop().run_in_executor(None, _get_encoding, model)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Args:
+        text: Text to count
+        model: Model the text is meant for
+
+    Returns:
+        Number of tokens (estimated as ~4 characters per token without tiktoken)
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4  # Rough estimate: ~4 chars per token
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_input_tokens(user_input: Union[str, List[Message]], model: str) -> int:
+    """
+    Count the tokens in a prompt given either as a string or as a list of messages.
+
+    Args:
+        user_input: Either a string or a list of message objects
+        model: Model the prompt is meant for
+
+    Returns:
+        Number of tokens across all text message contents
+    """
+    if isinstance(user_input, str):
+        return count_tokens(user_input, model)
+
+    return sum(
+        count_tokens(msg["content"], model)
+        for msg in user_input
+        if isinstance(msg, dict) and isinstance(msg.get("content"), str)
+    )
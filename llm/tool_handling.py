@@ -1,12 +1,84 @@
+import asyncio
+import base64
 import json
 import logging
-import uuid
-from typing import Dict, Any, List, Optional, Tuple, Union, cast
+import os
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Set, Tuple, Union, cast
 
-from llm.types import ToolCallResponse
+from llm.types import ToolCallResponse, ToolInfo
+
+__all__ = [
+    'prepare_tools_for_api',
+    'prepare_tools_for_api_lazy',
+    'extract_tool_info',
+    'create_shortened_tool_ids',
+    'process_function_calls',
+    'prepare_assistant_message_with_tool_calls',
+]
 
 logger = logging.getLogger(__name__)
 
+# Formatted tools keyed by (api_type, id of a tools tuple) or (api_type, ids of the tools in a list). Each entry
+# holds on to the tools it was built from, so their ids can't be reused by other objects while it is cached.
+_FORMAT_CACHE: Dict[Tuple[str, Any], Tuple[Sequence[Dict[str, Any]], Optional[List[Dict[str, Any]]]]] = {}
+_FORMAT_CACHE_MAXSIZE = 128
+
+# Lazy-loading summaries keyed by id of the tool they summarize, holding (tool, name, summary) so the id stays valid
+_SUMMARY_CACHE: Dict[int, Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, Any]]]] = {}
+_SUMMARY_CACHE_MAXSIZE = 1024
+
+
+# JSON schema keywords that only annotate a schema and are dropped when compacting it
+_DROPPED_SCHEMA_KEYS = frozenset(('title', '$comment', 'examples'))
+# Keywords whose values are kept exactly, even when empty
+_LITERAL_SCHEMA_KEYS = frozenset(('default', 'const', 'enum'))
+# Keywords whose values map names to schemas
+_SCHEMA_MAP_KEYS = frozenset(('properties', 'patternProperties', 'definitions', '$defs'))
+
+# Schemas used for the predefined Anthropic tools; shared by every call, so do not mutate
+_SEARCH_DB_SCHEMA: Dict[str, Any] = {
+    "name": "search_database",
+    "description": "Search a database for information",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The search query"
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Maximum number of results"
+            }
+        },
+        "required": ["query"]
+    }
+}
+
+_WEATHER_SCHEMA: Dict[str, Any] = {
+    "name": "get_weather",
+    "description": "Get the current weather for a location",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "location": {
+                "type": "string",
+                "description": "City or region name"
+            },
+            "unit": {
+                "type": "string",
+                "description": "Temperature unit (celsius or fahrenheit)"
+            }
+        },
+        "required": ["location"]
+    }
+}
+
+_PREDEFINED_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "search_database": _SEARCH_DB_SCHEMA,
+    "get_weather": _WEATHER_SCHEMA,
+}
+
 
 def _format_tools_for_anthropic(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -63,7 +135,7 @@ def _format_tools_for_anthropic(tools: List[Dict[str, Any]]) -> List[Dict[str, A
     return formatted_tools
 
 
-def extract_tool_info(tool_call: Any) -> Dict[str, Any]:
+def extract_tool_info(tool_call: Any) -> ToolInfo:
     """
     Extract consistent tool information from different tool call formats
 
@@ -71,223 +143,382 @@ def extract_tool_info(tool_call: Any) -> Dict[str, Any]:
         tool_call: A tool call object from any provider
 
     Returns:
-        Dictionary with standardized tool information
+        Standardized tool information
     """
-    tool_info: Dict[str, Optional[str]] = {
-        'id': None,
-        'name': None,
-        'type': None,
-        'arguments': None,
-    }
-
-    # Try to extract the tool ID
-    if hasattr(tool_call, 'call_id'):
-        tool_info['id'] = tool_call.call_id
-    elif hasattr(tool_call, 'id'):
-        tool_info['id'] = tool_call.id
-
-    # Try to extract tool type
-    if hasattr(tool_call, 'type'):
-        tool_info['type'] = tool_call.type
-
-    # Try to extract tool name and arguments
-    if hasattr(tool_call, 'name'):
-        tool_info['name'] = tool_call.name
-    if hasattr(tool_call, 'arguments'):
-        tool_info['arguments'] = tool_call.arguments
+    # getattr with a default does one lookup per attribute instead of a hasattr probe plus access
+    tool_id = getattr(tool_call, 'call_id', None) or getattr(tool_call, 'id', None)
+    name = getattr(tool_call, 'name', None)
+    arguments = getattr(tool_call, 'arguments', None)
 
     # Handle nested function structure (OpenAI Chat Completions API)
-    if hasattr(tool_call, 'function'):
-        if not tool_info['name'] and hasattr(tool_call.function, 'name'):
-            tool_info['name'] = tool_call.function.name
-        if not tool_info['arguments'] and hasattr(tool_call.function, 'arguments'):
-            tool_info['arguments'] = tool_call.function.arguments
+    function = getattr(tool_call, 'function', None)
+    if function is not None:
+        if not name:
+            name = getattr(function, 'name', None)
+        if not arguments:
+            arguments = getattr(function, 'arguments', None)
 
-    return tool_info
+    return ToolInfo(tool_id, name, getattr(tool_call, 'type', None), arguments)
 
 
-def prepare_tools_for_api(tools_list: Optional[List[Dict[str, Any]]], api_type: str) -> Optional[List[Dict[str, Any]]]:
+def prepare_tools_for_api(
+        tools_list: Optional[Sequence[Dict[str, Any]]],
+        api_type: str
+) -> Optional[List[Dict[str, Any]]]:
     """
     Format tools differently based on API type
 
+    Formatted tools are cached: tuples, such as the schemas returned by ToolRegistry.get_schemas, by
+    their identity, and lists by the identity of the tools they contain. Tool definitions are therefore
+    treated as immutable once passed in; pass new dicts rather than modifying them in place. Each call
+    gets its own list.
+
     Args:
-        tools_list: List of tool definitions
+        tools_list: List or tuple of tool definitions
         api_type: Either 'responses', 'completions', or 'anthropic'
 
     Returns:
         Properly formatted tools list for the specified API
     """
-    if not tools_list:
+    prepare = _DISPATCH.get(api_type)
+    if prepare is None or not tools_list:
         return None
-        
-    # Log input tool format for debugging
-    logger.debug(f"Preparing tools for {api_type}, input tools: {tools_list}")
-
-    if api_type == 'responses':
-        # Responses API needs tools with name at the root level
-        formatted_tools: List[Dict[str, Any]] = []
-        for tool in tools_list:
-            # Skip any tools without a type or function or name
-            if not any(k in tool for k in ['type', 'function', 'name']):
-                logger.warning(f"Skipping invalid tool format: {tool}")
-                continue
-                
-            if tool.get('type') == 'function':
-                # Check if the tool is already in the Responses API format
-                if 'name' in tool and 'parameters' in tool:
-                    # Already in correct format
-                    formatted_tools.append(tool)
-                elif 'function' in tool:
-                    # Convert from Chat Completions format to Responses format
-                    function_data = tool['function']
-                    formatted_tool = {
-                        "type": "function",
-                        "name": function_data.get('name'),
-                        "description": function_data.get('description', ''),
-                        "parameters": function_data.get('parameters', {})
-                    }
-                    formatted_tools.append(formatted_tool)
+
+    # Tuples are immutable, so their own identity is enough; a list may change between calls
+    if isinstance(tools_list, tuple):
+        tools = tools_list
+        key: Tuple[str, Any] = (api_type, id(tools))
+    else:
+        tools = tuple(tools_list)
+        key = (api_type, tuple(map(id, tools)))
+
+    cached = _FORMAT_CACHE.get(key)
+    if cached is not None:
+        formatted_tools = cached[1]
+    else:
+        # Log input tool format for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Preparing tools for %s, input tools: %s", api_type, tools_list)
+
+        formatted_tools = prepare(tools_list)
+
+        # Evict the oldest entry once the cache is full
+        if len(_FORMAT_CACHE) >= _FORMAT_CACHE_MAXSIZE:
+            del _FORMAT_CACHE[next(iter(_FORMAT_CACHE))]
+        _FORMAT_CACHE[key] = (tools, formatted_tools)
+
+    # A new list per call, so one caller changing it doesn't affect the others
+    return list(formatted_tools) if formatted_tools is not None else None
+
+
+def _compact_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Remove parts of a JSON schema that don't affect how a tool is invoked.
+
+    Drops annotation-only keywords (title, $comment, examples) and keys with empty values
+    ('', [], {} or None), which cuts the tokens tool definitions cost on every request.
+    Property names and default/const/enum values are kept as they are.
+
+    Args:
+        schema: JSON schema to compact
+
+    Returns:
+        A compacted copy of the schema, or the schema itself if it isn't a dict (e.g. None)
+    """
+    if not isinstance(schema, dict):
+        return schema
+
+    compact: Dict[str, Any] = {}
+    for key, value in schema.items():
+        if key in _DROPPED_SCHEMA_KEYS:
+            continue
+        if key in _LITERAL_SCHEMA_KEYS:
+            compact[key] = value
+            continue
+
+        if key in _SCHEMA_MAP_KEYS and isinstance(value, dict):
+            # Keys of these maps are names, not keywords; an empty schema is still a valid entry
+            compact[key] = {
+                name: _compact_schema(sub_schema) if isinstance(sub_schema, dict) else sub_schema
+                for name, sub_schema in value.items()
+            }
+            continue
+
+        if isinstance(value, dict):
+            value = _compact_schema(value)
+        elif isinstance(value, (list, tuple)):
+            value = [_compact_schema(item) if isinstance(item, dict) else item for item in value]
+
+        if value is None or value == '' or value == [] or value == {}:
+            continue
+        compact[key] = value
+
+    return compact
+
+
+def _valid_tools(
+        tools_list: List[Dict[str, Any]],
+        warning: str = "Skipping invalid tool format: %s"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the tools that have a type, function or name, logging a warning for the others.
+
+    Args:
+        tools_list: List of tool definitions
+        warning: Warning logged for each skipped tool, with a %s placeholder for the tool
+
+    Yields:
+        The valid tools, in order
+    """
+    for tool in tools_list:
+        # Direct membership tests avoid building a generator for any() on every tool
+        if 'type' in tool or 'function' in tool or 'name' in tool:
+            yield tool
+        else:
+            logger.warning(warning, tool)
+
+
+def _compact_function(function_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a Chat Completions function definition with its parameter schema compacted."""
+    function_copy = dict(function_data)
+    if 'parameters' in function_copy:
+        function_copy['parameters'] = _compact_schema(function_copy['parameters'])
+    return function_copy
+
+
+def _prep_responses(tools_list: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Format tools for the Responses API, which needs tools with name at the root level.
+
+    Args:
+        tools_list: Non-empty list of tool definitions
+
+    Returns:
+        Formatted tools list, or None if no tool is valid
+    """
+    # Fast path: every tool is already a Responses API function tool, so only compact the schemas
+    if all(tool.get('type') == 'function' and 'name' in tool and 'parameters' in tool for tool in tools_list):
+        logger.debug("Prepared %d tools for Responses API", len(tools_list))
+        return [{**tool, "parameters": _compact_schema(tool['parameters'])} for tool in tools_list]
+
+    formatted_tools: List[Dict[str, Any]] = []
+    for tool in _valid_tools(tools_list):
+
+        if tool.get('type') == 'function':
+            # Check if the tool is already in the Responses API format
+            if 'name' in tool and 'parameters' in tool:
+                # Already in correct format
+                formatted_tools.append({**tool, "parameters": _compact_schema(tool['parameters'])})
             elif 'function' in tool:
-                # No type specified but has function field
+                # Convert from Chat Completions format to Responses format
                 function_data = tool['function']
                 formatted_tool = {
                     "type": "function",
-                    "name": function_data.get('name'),
+                    "name": function_data.get('name', tool.get('name')),
                     "description": function_data.get('description', ''),
-                    "parameters": function_data.get('parameters', {})
+                    "parameters": _compact_schema(function_data.get('parameters', {}))
                 }
                 formatted_tools.append(formatted_tool)
-            elif 'name' in tool and 'input_schema' in tool:
-                # Convert from Anthropic format to Responses format
-                formatted_tool = {
-                    "type": "function",
+        elif 'function' in tool:
+            # No type specified but has function field
+            function_data = tool['function']
+            formatted_tool = {
+                "type": "function",
+                "name": function_data.get('name'),
+                "description": function_data.get('description', ''),
+                "parameters": _compact_schema(function_data.get('parameters', {}))
+            }
+            formatted_tools.append(formatted_tool)
+        elif 'name' in tool and 'input_schema' in tool:
+            # Convert from Anthropic format to Responses format
+            formatted_tool = {
+                "type": "function",
+                "name": tool['name'],
+                "description": tool.get('description', ''),
+                "parameters": _compact_schema(tool['input_schema'])
+            }
+            formatted_tools.append(formatted_tool)
+        else:
+            # Non-function tools, pass through as is
+            formatted_tools.append(tool)
+
+    logger.debug("Prepared %d tools for Responses API", len(formatted_tools))
+    return formatted_tools if formatted_tools else None
+
+
+def _prep_completions(tools_list: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Format tools for the Chat Completions API, which only accepts function tools.
+
+    Args:
+        tools_list: Non-empty list of tool definitions
+
+    Returns:
+        Formatted tools list, or None if no tool is valid
+    """
+    # Fast path: every tool is already a complete Chat Completions tool, so only compact the schemas
+    if all('type' in tool and 'name' in tool.get('function', ()) for tool in tools_list):
+        formatted_tools = [
+            {**tool, "function": _compact_function(tool['function'])} for tool in tools_list
+        ]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prepared %d tools for Chat Completions API: %s", len(formatted_tools), formatted_tools)
+        return formatted_tools
+
+    formatted_tools: List[Dict[str, Any]] = []
+    for tool in _valid_tools(tools_list):
+
+        # Handle various input formats and convert to Chat Completions format
+        if 'function' in tool:
+            # Already in proper Chat Completions format or close to it
+            tool_copy = tool.copy()
+            function_data = tool_copy['function'] = _compact_function(tool['function'])
+
+            # Ensure function has a name field
+            if 'name' not in function_data and 'name' in tool_copy:
+                function_data['name'] = tool_copy['name']
+
+            # Ensure type is set
+            if 'type' not in tool_copy:
+                tool_copy['type'] = 'function'
+
+            formatted_tools.append(tool_copy)
+        elif 'name' in tool and 'parameters' in tool:
+            # Convert from Responses format to Chat Completions format
+            formatted_tool = {
+                "type": "function",
+                "function": {
                     "name": tool['name'],
                     "description": tool.get('description', ''),
-                    "parameters": tool['input_schema']
-                }
-                formatted_tools.append(formatted_tool)
-            else:
-                # Non-function tools, pass through as is
-                formatted_tools.append(tool)
-        
-        logger.debug(f"Prepared {len(formatted_tools)} tools for Responses API")
-        return formatted_tools if formatted_tools else None
-    elif api_type == 'completions':
-        # Chat Completions API only accepts function tools with specific format
-        formatted_tools: List[Dict[str, Any]] = []
-        for tool in tools_list:
-            # Skip any tools without a type or function or name
-            if not any(k in tool for k in ['type', 'function', 'name']):
-                logger.warning(f"Skipping invalid tool format: {tool}")
-                continue
-                
-            # Handle various input formats and convert to Chat Completions format
-            if 'function' in tool:
-                # Already in proper Chat Completions format or close to it
-                tool_copy = tool.copy()
-                
-                # Ensure function has a name field
-                if 'name' not in tool_copy['function'] and 'name' in tool_copy:
-                    tool_copy['function']['name'] = tool_copy['name']
-                
-                # Ensure type is set
-                if 'type' not in tool_copy:
-                    tool_copy['type'] = 'function'
-                    
-                formatted_tools.append(tool_copy)
-            elif 'name' in tool and 'parameters' in tool:
-                # Convert from Responses format to Chat Completions format
-                formatted_tool = {
-                    "type": "function",
-                    "function": {
-                        "name": tool['name'],
-                        "description": tool.get('description', ''),
-                        "parameters": tool['parameters']
-                    }
+                    "parameters": _compact_schema(tool['parameters'])
                 }
-                formatted_tools.append(formatted_tool)
-            elif 'name' in tool and 'input_schema' in tool:
-                # Convert from Anthropic format to Chat Completions format
-                formatted_tool = {
-                    "type": "function",
-                    "function": {
-                        "name": tool['name'],
-                        "description": tool.get('description', ''),
-                        "parameters": tool['input_schema']
-                    }
-                }
-                formatted_tools.append(formatted_tool)
-                
-        logger.debug(f"Prepared {len(formatted_tools)} tools for Chat Completions API: {formatted_tools}")
-        return formatted_tools if formatted_tools else None
-    elif api_type == 'anthropic':
-        # Anthropic API requires a different format
-        
-        # Filter out invalid tools first
-        valid_tools = []
-        for tool in tools_list:
-            if not any(k in tool for k in ['type', 'function', 'name']):
-                logger.warning(f"Skipping invalid tool format for Anthropic: {tool}")
-                continue
-            
-            # Special handling for predefined tool names
-            if 'name' in tool and tool['name'] == "search_database":
-                # Provide a proper search tool schema
-                anthropic_tool = {
-                    "name": "search_database",
-                    "description": "Search a database for information",
-                    "input_schema": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The search query"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "description": "Maximum number of results"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-                valid_tools.append(anthropic_tool)
-            elif 'name' in tool and tool['name'] == "get_weather":
-                # Provide a proper weather tool schema
-                anthropic_tool = {
-                    "name": "get_weather",
-                    "description": "Get the current weather for a location",
-                    "input_schema": {
-                        "type": "object",
-                        "properties": {
-                            "location": {
-                                "type": "string",
-                                "description": "City or region name"
-                            },
-                            "unit": {
-                                "type": "string",
-                                "description": "Temperature unit (celsius or fahrenheit)"
-                            }
-                        },
-                        "required": ["location"]
-                    }
+            }
+            formatted_tools.append(formatted_tool)
+        elif 'name' in tool and 'input_schema' in tool:
+            # Convert from Anthropic format to Chat Completions format
+            formatted_tool = {
+                "type": "function",
+                "function": {
+                    "name": tool['name'],
+                    "description": tool.get('description', ''),
+                    "parameters": _compact_schema(tool['input_schema'])
                 }
-                valid_tools.append(anthropic_tool)
-            else:
-                valid_tools.append(tool)
-        
-        # Use the dedicated format function to convert tools
-        formatted_tools = _format_tools_for_anthropic(valid_tools)
-        
-        # Ensure all input_schema objects have the required 'type': 'object'
-        for tool in formatted_tools:
-            if 'input_schema' in tool and 'type' not in tool['input_schema']:
-                tool['input_schema']['type'] = 'object'
-        
-        logger.debug(f"Prepared {len(formatted_tools)} tools for Anthropic API")
-        return formatted_tools if formatted_tools else None
+            }
+            formatted_tools.append(formatted_tool)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prepared %d tools for Chat Completions API: %s", len(formatted_tools), formatted_tools)
+    return formatted_tools if formatted_tools else None
+
+
+def _prep_anthropic(tools_list: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Format tools for the Anthropic API.
+
+    Args:
+        tools_list: Non-empty list of tool definitions
+
+    Returns:
+        Formatted tools list, or None if no tool is valid
+    """
+    # Filter out invalid tools first
+    valid_tools = []
+    for tool in _valid_tools(tools_list, "Skipping invalid tool format for Anthropic: %s"):
+        # Predefined tool names get a proper schema in a single lookup
+        predefined = _PREDEFINED_SCHEMAS.get(tool.get('name'))
+        valid_tools.append(predefined if predefined is not None else tool)
+
+    # Use the dedicated format function to convert tools
+    formatted_tools = _format_tools_for_anthropic(valid_tools)
+
+    # Compact the schemas and ensure all of them have the required 'type': 'object'
+    for i, tool in enumerate(formatted_tools):
+        if 'input_schema' in tool:
+            input_schema = _compact_schema(tool['input_schema'])
+            if isinstance(input_schema, dict):
+                input_schema.setdefault('type', 'object')
+            formatted_tools[i] = {**tool, 'input_schema': input_schema}
+
+    # Mark the end of the tool definitions as a prompt cache breakpoint, so Anthropic can reuse
+    # the cached tools on later turns; the last tool is copied to leave the caller's dict untouched
+    if formatted_tools:
+        formatted_tools[-1] = {**formatted_tools[-1], 'cache_control': {'type': 'ephemeral'}}
+
+    logger.debug("Prepared %d tools for Anthropic API", len(formatted_tools))
+    return formatted_tools if formatted_tools else None
+
+
+# Tool formatters by API type
+_DISPATCH = {
+    'responses': _prep_responses,
+    'completions': _prep_completions,
+    'anthropic': _prep_anthropic,
+}
+
+
+def _tool_name_and_description(tool: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """Get the name and description of a tool in any supported format."""
+    nested = tool.get('function') or tool.get('custom') or {}
+    name = tool.get('name') or nested.get('name')
+    description = tool.get('description') or nested.get('description') or ''
+    return name, description
+
+
+def prepare_tools_for_api_lazy(
+        tools_list: Optional[Sequence[Dict[str, Any]]],
+        api_type: str,
+        active_names: Set[str]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Format tools for an API, sending full parameter schemas only for the active tools.
+
+    Inactive tools are sent as compact summaries (name, one-line description and an empty
+    parameter schema), which keeps large tool registries from inflating every request. Tools
+    keep their original order, so the result stays stable for prompt caching. Summaries are
+    cached per tool definition, so repeated calls reuse them and hit the format cache.
+
+    Args:
+        tools_list: List of tool definitions
+        api_type: Either 'responses', 'completions', or 'anthropic'
+        active_names: Names of the tools whose full schemas should be sent
+
+    Returns:
+        Properly formatted tools list for the specified API
+    """
+    if not tools_list:
+        return None
+
+    tools: List[Dict[str, Any]] = []
+    for tool in tools_list:
+        cached = _SUMMARY_CACHE.get(id(tool))
+        if cached is None:
+            name, description = _tool_name_and_description(tool)
+            summary = None if name is None else {
+                "type": "function",
+                "name": name,
+                "description": description.strip().split("\n", 1)[0][:200],
+                "parameters": {"type": "object", "properties": {}}
+            }
+
+            # Evict the oldest entry once the cache is full
+            if len(_SUMMARY_CACHE) >= _SUMMARY_CACHE_MAXSIZE:
+                del _SUMMARY_CACHE[next(iter(_SUMMARY_CACHE))]
+            cached = _SUMMARY_CACHE[id(tool)] = (tool, name, summary)
+
+        _, name, summary = cached
+        tools.append(tool if summary is None or name in active_names else summary)
+
+    return prepare_tools_for_api(tools, api_type)
+
+
+# Longest tool call ID the Chat Completions API accepts
+_MAX_TOOL_CALL_ID_LENGTH = 40
 
-    return None
+
+def _new_call_id() -> str:
+    """Generate a random 35-character tool call ID, under the Chat Completions 40-character limit."""
+    # One urandom read and a C-level base64 encode; 22 random bytes give 30 URL-safe characters
+    return "call_" + base64.urlsafe_b64encode(os.urandom(22)).decode('ascii')[:30]
 
 
 def create_shortened_tool_ids(tool_calls: List[Any]) -> Dict[str, str]:
@@ -298,17 +529,25 @@ def create_shortened_tool_ids(tool_calls: List[Any]) -> Dict[str, str]:
         tool_calls: List of tool call objects
         
     Returns:
-        Mapping of original IDs to shortened IDs
+        Mapping of original IDs to shortened IDs; IDs that already fit are mapped to themselves
     """
     id_mapping: Dict[str, str] = {}
+    log_mappings = logger.isEnabledFor(logging.INFO)
 
     for tool_call in tool_calls:
-        # Generate a new UUID that's exactly 36 characters
-        short_id = f"call_{str(uuid.uuid4())[:35 - 5]}"  # Keep under 40 chars
-        original_id = getattr(tool_call, 'call_id',
-                              getattr(tool_call, 'id', 'unknown'))
+        original_id = getattr(tool_call, 'call_id', None) or getattr(tool_call, 'id', None)
+        if original_id is None:
+            continue
+
+        # IDs within the 40-character limit (e.g. Chat Completions IDs) don't need a new one
+        if len(original_id) <= _MAX_TOOL_CALL_ID_LENGTH:
+            id_mapping[original_id] = original_id
+            continue
+
+        short_id = _new_call_id()
         id_mapping[original_id] = short_id
-        logger.info(f"Mapped original ID {original_id} to shorter ID {short_id}")
+        if log_mappings:
+            logger.info("Mapped original ID %s to shorter ID %s", original_id, short_id)
 
     return id_mapping
 
@@ -332,7 +571,12 @@ async def process_function_calls(
     if id_mapping is None:
         id_mapping = create_shortened_tool_ids(function_calls)
 
-    tool_responses: List[ToolCallResponse] = []
+    # Responses are collected in call order in a list sized for every call; tool executions fill
+    # their slot once gathered, and the unused tail left by skipped internal tools is trimmed
+    tool_responses: List[Optional[ToolCallResponse]] = [None] * len(function_calls)
+    out_idx = 0
+    pending: List[Tuple[int, str, str, Any]] = []  # (slot, tool_call_id, function_name, arguments_json)
+    executions = []
 
     for tool_call in function_calls:
         try:
@@ -340,60 +584,46 @@ async def process_function_calls(
             tool_info = extract_tool_info(tool_call)
 
             # Skip internal tools
-            if tool_info['type'] and tool_registry.is_internal_tool(tool_info['type']):
-                logger.info(f"Skipping internal tool of type {tool_info['type']}")
+            if tool_info.type and tool_registry.is_internal_tool(tool_info.type):
+                logger.info("Skipping internal tool of type %s", tool_info.type)
                 continue
 
-            function_name = tool_info['name']
-            arguments_json = tool_info['arguments']
-            original_id = tool_info['id']
+            function_name = tool_info.name
+            arguments_json = tool_info.arguments
+            original_id = tool_info.id
 
             # Use the shortened ID if available
             tool_call_id = id_mapping.get(original_id, original_id) if original_id else "unknown_id"
 
-            logger.info(f"Handling function call: {function_name} with ID {tool_call_id}")
+            logger.info("Handling function call: %s with ID %s", function_name, tool_call_id)
 
             if not tool_registry.has_tool(function_name):
                 error_message = f"Error: Tool '{function_name}' not found in registry"
                 logger.error(error_message)
-                tool_responses.append({
+                tool_responses[out_idx] = {
                     "tool_call_id": tool_call_id,
                     "output": error_message
-                })
+                }
+                out_idx += 1
                 continue
 
             try:
-                # Parse arguments JSON
+                # Parse each call's arguments on its own, so one call's JSON can't affect another's
                 args: Dict[str, Any] = json.loads(arguments_json) if arguments_json else {}
-
-                # Execute the tool with the arguments
-                result = await tool_registry.execute_tool(function_name, args)
-
-                # Format the result
-                if isinstance(result, dict):
-                    formatted_result = json.dumps(result)
-                else:
-                    formatted_result = str(result)
-
-                tool_responses.append({
-                    "tool_call_id": tool_call_id,
-                    "output": formatted_result
-                })
-                logger.info(f"Tool processed: {function_name}")
             except json.JSONDecodeError as e:
                 error_message = f"Invalid JSON arguments for tool {function_name}: {e}"
                 logger.error(error_message)
-                tool_responses.append({
+                tool_responses[out_idx] = {
                     "tool_call_id": tool_call_id,
                     "output": error_message
-                })
-            except Exception as e:
-                error_message = f"Error executing tool {function_name}: {str(e)}"
-                logger.error(f"{error_message}\nArguments: {arguments_json}")
-                tool_responses.append({
-                    "tool_call_id": tool_call_id,
-                    "output": error_message
-                })
+                }
+                out_idx += 1
+                continue
+
+            # Reserve this call's slot; the tool runs concurrently with the others below
+            pending.append((out_idx, tool_call_id, function_name, arguments_json))
+            out_idx += 1
+            executions.append(tool_registry.execute_tool(function_name, args))
         except Exception as e:
             # Catch-all for any unexpected errors in tool call processing
             error_message = f"Unexpected error processing tool call: {str(e)}"
@@ -407,12 +637,45 @@ async def process_function_calls(
             except:
                 pass
 
-            tool_responses.append({
+            tool_responses[out_idx] = {
+                "tool_call_id": tool_call_id,
+                "output": error_message
+            }
+            out_idx += 1
+
+    # Execute the tools concurrently, so independent calls take as long as the slowest one
+    results = await asyncio.gather(*executions, return_exceptions=True)
+
+    for (slot, tool_call_id, function_name, arguments_json), result in zip(pending, results):
+        if isinstance(result, BaseException) and not isinstance(result, Exception):
+            # Don't swallow cancellation and other non-error exceptions
+            raise result
+
+        try:
+            if isinstance(result, Exception):
+                raise result
+
+            # Format the result
+            if isinstance(result, dict):
+                formatted_result = json.dumps(result)
+            else:
+                formatted_result = str(result)
+
+            tool_responses[slot] = {
+                "tool_call_id": tool_call_id,
+                "output": formatted_result
+            }
+            logger.info("Tool processed: %s", function_name)
+        except Exception as e:
+            error_message = f"Error executing tool {function_name}: {str(e)}"
+            logger.error("%s\nArguments: %s", error_message, arguments_json)
+            tool_responses[slot] = {
                 "tool_call_id": tool_call_id,
                 "output": error_message
-            })
+            }
 
-    return tool_responses
+    del tool_responses[out_idx:]
+    return cast(List[ToolCallResponse], tool_responses)
 
 
 def prepare_assistant_message_with_tool_calls(
@@ -431,33 +694,26 @@ def prepare_assistant_message_with_tool_calls(
     Returns:
         Dict containing the assistant message with tool_calls field
     """
-    assistant_message: Dict[str, Any] = {
-        "role": "assistant",
-        "content": content,
-        "tool_calls": []
-    }
-
+    tool_calls: List[Dict[str, Any]] = []
     for tool_call in function_calls:
         # Extract tool info consistently
         tool_info = extract_tool_info(tool_call)
+        original_id = tool_info.id
 
-        # Get original ID
-        original_id = tool_info['id']
-
-        # Use shortened ID
-        short_id = id_mapping.get(original_id, original_id) if original_id else str(uuid.uuid4())
-
-        # Get function name and arguments
-        function_name = tool_info['name']
-        arguments_json = tool_info['arguments']
-
-        assistant_message["tool_calls"].append({
-            "id": short_id,
+        # Dict literal keys are compile-time constants, which CPython already interns
+        tool_calls.append({
+            "id": id_mapping.get(original_id, original_id) if original_id else _new_call_id(),
             "type": "function",
             "function": {
-                "name": function_name,
-                "arguments": arguments_json
+                "name": tool_info.name,
+                "arguments": tool_info.arguments
             }
         })
 
+    assistant_message: Dict[str, Any] = {
+        "role": "assistant",
+        "content": content,
+        "tool_calls": tool_calls
+    }
+
     return assistant_message
@@ -1,7 +1,25 @@
-import inspect
+import asyncio
+import copy
+import functools
+import json
 import logging
-from typing import Set, Dict, Any, Callable, List, Optional, TypeVar, Union, Awaitable, get_type_hints, get_origin, \
-    get_args
+import re
+import sys
+import time
+from collections import OrderedDict
+from inspect import Parameter, iscoroutinefunction, signature as _signature, unwrap
+from types import MappingProxyType
+from typing import Set, Dict, Any, Callable, FrozenSet, List, Mapping, Optional, Tuple, TypeVar, Union, Awaitable, \
+    get_type_hints, get_origin, get_args
+
+# Encodes tool schemas as UTF-8 JSON; orjson is an optional dependency
+_dumps: Callable[[Any], bytes]
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
 
 from llm.types import OpenAIToolSchema, AnthropicToolSchema, Tool
 
@@ -18,16 +36,59 @@ TYPE_MAP = {
     bool: "boolean",
     list: "array",
     dict: "object",
-    None: "null",
-    type(None): "null"
+    type(None): "null"  # get_type_hints normalizes None annotations to NoneType
 }
 
+# How long, and for how many argument sets, results of cacheable tools are kept
+_RESULT_CACHE_TTL = 30.0  # Seconds
+_RESULT_CACHE_MAXSIZE = 256
+
+# "name: description" lines in a docstring; [ \t] rather than \s so a match never spans lines
+_PARAM_DOC_RE = re.compile(r'^[ \t]*(\w+):[ \t]*(\S.*?)[ \t\r]*$', re.MULTILINE)
+_NO_PARAM_DOCS: Mapping[str, str] = MappingProxyType({})  # Shared by functions without a docstring
+
+# Marker for parameters without a default value
+_EMPTY = Parameter.empty
+
 # Type variable for tool function return type
 T = TypeVar('T')
 ToolFunction = Callable[..., Union[T, Awaitable[T]]]
 DecoratedToolFunction = ToolFunction[T]
 
 
+def _json_type(hint: Any) -> str:
+    """
+    Get the JSON schema type for a parameter type hint.
+
+    Args:
+        hint: Type hint of the parameter
+
+    Returns:
+        The JSON schema type, "string" if the hint has no mapping
+    """
+    # Handle Union types
+    if get_origin(hint) is Union:
+        # Get the Union arguments
+        union_args = get_args(hint)
+        # If one of the union types is None, it means this is an Optional parameter
+        if type(None) in union_args:
+            # Use the first non-None type
+            non_none_types = [t for t in union_args if t is not type(None)]
+            if non_none_types:
+                return TYPE_MAP.get(non_none_types[0], "string")
+            return "string"
+
+        # Just take the first type in the Union
+        return TYPE_MAP.get(union_args[0], "string")
+
+    # Handle regular types
+    return TYPE_MAP.get(hint, "string")
+
+
+# Type hints like Optional[str] repeat across tools, so resolved types are cached per hint
+_resolve_json_type = functools.lru_cache(maxsize=512)(_json_type)
+
+
 def llm_tool(func: ToolFunction[T]) -> DecoratedToolFunction[T]:
     """
     Generic decorator to register a function as a tool for multiple LLM providers.
@@ -41,11 +102,11 @@ def llm_tool(func: ToolFunction[T]) -> DecoratedToolFunction[T]:
     Returns:
         The decorated function with LLM-specific tool schemas attached
     """
-    signature = inspect.signature(func)
+    signature = _signature(func)
     type_hints = get_type_hints(func)
 
     # Common properties for all LLM schemas
-    func_name = func.__name__
+    func_name = sys.intern(func.__name__)
     func_description = func.__doc__ or f"Function {func_name}"
 
     # Build parameters schema
@@ -55,55 +116,46 @@ def llm_tool(func: ToolFunction[T]) -> DecoratedToolFunction[T]:
         "required": []
     }
 
+    # Parse "name: description" lines from the docstring once for all parameters
+    # This is a simple implementation - more sophisticated docstring parsing could be used
+    param_docs = dict(_PARAM_DOC_RE.findall(func.__doc__)) if func.__doc__ else _NO_PARAM_DOCS
+
+    # Bind lookups used for every parameter to locals
+    properties = parameters["properties"]
+    required = parameters["required"]
+
     for name, param in signature.parameters.items():
         # Get the type annotation for this parameter
         param_type_hint = type_hints.get(name, Any)
         
-        # Get the JSON schema type
-        json_type = "string"  # Default to string
-        
-        # Handle Union types
-        if get_origin(param_type_hint) is Union:
-            # Get the Union arguments
-            union_args = get_args(param_type_hint)
-            # If one of the union types is None, it means this is an Optional parameter
-            if type(None) in union_args or None in union_args:
-                # Use the first non-None type
-                non_none_types = [t for t in union_args if t is not type(None) and t is not None]
-                if non_none_types:
-                    param_type_hint = non_none_types[0]
-                    json_type = TYPE_MAP.get(param_type_hint, "string")
-            else:
-                # Just take the first type in the Union
-                json_type = TYPE_MAP.get(union_args[0], "string")
+        # Get the JSON schema type, checking the most common hints by identity first
+        if param_type_hint is str:
+            json_type = "string"
+        elif param_type_hint is int:
+            json_type = "integer"
         else:
-            # Handle regular types
-            json_type = TYPE_MAP.get(param_type_hint, "string")
+            try:
+                json_type = _resolve_json_type(param_type_hint)
+            except TypeError:
+                # Unhashable hints can't be cached
+                json_type = _json_type(param_type_hint)
         
         # Get parameter description from docstring if available
-        description = ""
-        if func.__doc__:
-            # Try to parse docstring to find parameter descriptions
-            # This is a simple implementation - more sophisticated docstring parsing could be used
-            doc_lines = func.__doc__.split("\n")
-            for line in doc_lines:
-                line = line.strip()
-                if line.startswith(f"{name}:"):
-                    description = line[len(name) + 1:].strip()
-                elif line.startswith(f"    {name}: "):
-                    description = line[len(name) + 6:].strip()
+        description = param_docs.get(name, "")
         
         # Add parameter to schema
         param_schema: Dict[str, Any] = {"type": json_type}
         if description:
             param_schema["description"] = description
             
-        parameters["properties"][name] = param_schema
+        properties[name] = param_schema
         
         # Add to required if no default value
-        if param.default is param.empty:
-            parameters["required"].append(name)
+        if param.default is _EMPTY:
+            required.append(name)
 
+    # Each schema gets its own copy of the parameters so changing one can't affect the others;
+    # Anthropic's input_schema has the same fields
     # Create OpenAI tool schema
     openai_tool: OpenAIToolSchema = {
         "type": "function",
@@ -116,19 +168,13 @@ def llm_tool(func: ToolFunction[T]) -> DecoratedToolFunction[T]:
     setattr(func, 'openai_tool', openai_tool)
 
     # Create Anthropic tool schema
-    # Make a deep copy to avoid reference problems
-    import copy
     anthropic_tool: AnthropicToolSchema = {
         "name": func_name,
         "description": func_description,
-        "input_schema": {
-            "type": "object",  # This is required by Anthropic
-            "properties": copy.deepcopy(parameters["properties"]),
-            "required": copy.deepcopy(parameters["required"])
-        }
+        "input_schema": copy.deepcopy(parameters)
     }
     # Log the schema with proper level
-    logger.debug(f"Created Anthropic tool schema for {func_name}")
+    logger.debug("Created Anthropic tool schema for %s", func_name)
     setattr(func, 'anthropic_tool', anthropic_tool)
 
     # Generic tool schema (used by the registry for execution)
@@ -137,7 +183,7 @@ def llm_tool(func: ToolFunction[T]) -> DecoratedToolFunction[T]:
         "function": {
             "name": func_name,
             "description": func_description,
-            "parameters": parameters
+            "parameters": copy.deepcopy(parameters)
         }
     }
     setattr(func, 'tool', tool)
@@ -156,17 +202,26 @@ class ToolRegistry:
             internal_tool_types: Set of tool types that are handled internally by the LLM provider
         """
         self._tools: Dict[str, ToolFunction] = {}
-        self._schema_cache: Dict[str, List[Any]] = {}  # Cache for schemas by provider
-        self._cache_valid: Dict[str, bool] = {}  # Track if cache is valid for each provider
+        self._version = 0  # Incremented whenever the registered tools change
+        self._schema_cache: Dict[str, Tuple[int, Tuple[Dict[str, Any], ...]]] = {}  # (version, schemas) by provider
+        self._schema_json_cache: Dict[str, Tuple[Tuple[Dict[str, Any], ...], bytes]] = {}  # (schemas, JSON) by provider
         self._internal_tool_types: Set[str] = internal_tool_types or INTERNAL_TOOL_TYPES.copy()
-
-    def register(self, name: str, func: ToolFunction) -> 'ToolRegistry':
+        # Read-only snapshot returned by get_internal_tool_types; None after the set changes
+        self._internal_tool_types_frozen: Optional[FrozenSet[str]] = None
+        self._cacheable: Set[str] = set()  # Tools whose results may be reused for identical arguments
+        self._async_tools: Set[str] = set()  # Tools returning a coroutine, detected at registration
+        # Recent results of cacheable tools keyed by (tool function, arguments JSON), with the time they were stored
+        self._result_cache: "OrderedDict[Tuple[Any, str], Tuple[float, Any]]" = OrderedDict()
+
+    def register(self, name: str, func: ToolFunction, cacheable: bool = False) -> 'ToolRegistry':
         """
         Register a tool function with its schema.
         
         Args:
             name: Name of the tool
             func: Tool function (should have the llm_tool decorator)
+            cacheable: Whether results may be briefly reused for calls with identical arguments;
+                only enable this for tools without side effects
             
         Returns:
             Self for chaining
@@ -177,11 +232,22 @@ class ToolRegistry:
         if not hasattr(func, 'tool'):
             raise ValueError(f"Function {name} does not have a 'tool' attribute")
 
+        # Interned names let tool lookups match keys by identity
+        name = sys.intern(name)
+
         self._tools[name] = func
+        if cacheable:
+            self._cacheable.add(name)
+        else:
+            self._cacheable.discard(name)
+        # Sync wrappers made with functools.wraps around an async function return its coroutine
+        if iscoroutinefunction(func) or iscoroutinefunction(unwrap(func)):
+            self._async_tools.add(name)
+        else:
+            self._async_tools.discard(name)
 
         # Invalidate all schema caches when a new tool is registered
-        for provider in self._cache_valid:
-            self._cache_valid[provider] = False
+        self._version += 1
 
         return self
 
@@ -197,10 +263,11 @@ class ToolRegistry:
         """
         if name in self._tools:
             del self._tools[name]
+            self._cacheable.discard(name)
+            self._async_tools.discard(name)
 
             # Invalidate all schema caches when a tool is removed
-            for provider in self._cache_valid:
-                self._cache_valid[provider] = False
+            self._version += 1
 
         return self
 
@@ -216,6 +283,18 @@ class ToolRegistry:
         """
         return tool_type in self._internal_tool_types
 
+    def is_cacheable(self, name: str) -> bool:
+        """
+        Check if a tool's results may be reused for calls with identical arguments.
+
+        Args:
+            name: Name of the tool
+
+        Returns:
+            True if the tool was registered as cacheable, False otherwise
+        """
+        return name in self._cacheable
+
     def add_internal_tool_type(self, tool_type: str) -> None:
         """
         Register a tool type as being handled internally by the LLM provider.
@@ -224,15 +303,18 @@ class ToolRegistry:
             tool_type: The type of internal tool
         """
         self._internal_tool_types.add(tool_type)
+        self._internal_tool_types_frozen = None
 
-    def get_internal_tool_types(self) -> Set[str]:
+    def get_internal_tool_types(self) -> FrozenSet[str]:
         """
         Get all registered internal tool types.
 
         Returns:
-            Set of internal tool types
+            Read-only set of internal tool types
         """
-        return self._internal_tool_types.copy()
+        if self._internal_tool_types_frozen is None:
+            self._internal_tool_types_frozen = frozenset(self._internal_tool_types)
+        return self._internal_tool_types_frozen
 
     def get(self, name: str) -> ToolFunction:
         """
@@ -247,11 +329,12 @@ class ToolRegistry:
         Raises:
             KeyError: If the tool is not registered
         """
-        if name not in self._tools:
-            raise KeyError(f"Tool '{name}' not registered")
-        return self._tools[name]
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise KeyError(f"Tool '{name}' not registered") from None
 
-    def get_schemas(self, provider: str = "openai") -> List[Any]:
+    def get_schemas(self, provider: str = "openai") -> Tuple[Dict[str, Any], ...]:
         """
         Get all tool schemas for a specific provider.
         Uses cached schemas if available and valid.
@@ -260,19 +343,39 @@ class ToolRegistry:
             provider: The provider to get schemas for (openai, anthropic, etc.)
             
         Returns:
-            List of tool schemas formatted for the specified provider
+            Tuple of tool schemas formatted for the specified provider. Earlier versions returned a
+            list; convert with list() where a list is needed.
+        """
+        # The cache is valid if it was built for the current version of the registry
+        cached = self._schema_cache.get(provider)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+
+        self._build_schema_cache(provider)
+        return self._schema_cache[provider][1]
+
+    def get_schemas_json(self, provider: str = "openai") -> bytes:
+        """
+        Get all tool schemas for a specific provider encoded as JSON.
+        The encoding is cached until the provider's schemas change.
+
+        Args:
+            provider: The provider to get schemas for (openai, anthropic, etc.)
+
+        Returns:
+            UTF-8 encoded JSON array of tool schemas formatted for the specified provider
         """
-        # Initialize cache for provider if not exists
-        if provider not in self._schema_cache:
-            self._schema_cache[provider] = []
-            self._cache_valid[provider] = False
+        schemas = self.get_schemas(provider)
 
-        # Build schema cache if invalid
-        if not self._cache_valid.get(provider, False):
-            self._build_schema_cache(provider)
-            self._cache_valid[provider] = True
+        # get_schemas returns a new tuple whenever the schemas change, so identity means up to date
+        cached = self._schema_json_cache.get(provider)
+        if cached is not None and cached[0] is schemas:
+            return cached[1]
 
-        return self._schema_cache[provider]
+        encoded = _dumps(schemas)
+
+        self._schema_json_cache[provider] = (schemas, encoded)
+        return encoded
 
     def _build_schema_cache(self, provider: str) -> None:
         """
@@ -281,28 +384,23 @@ class ToolRegistry:
         Args:
             provider: The provider to build the cache for
         """
-        schemas = []
+        # Provider schemas are stored on the function as <provider>_tool by llm_tool
+        attr = provider + '_tool'
 
-        for name, func in self._tools.items():
-            if provider == "openai" and hasattr(func, 'openai_tool'):
-                schemas.append(func.openai_tool)
-            elif provider == "anthropic" and hasattr(func, 'anthropic_tool'):
-                schemas.append(func.anthropic_tool)
-            else:
-                # Always add the generic tool schema if specific provider schema not available
-                schemas.append(func.tool)
+        # Always use the generic tool schema if a specific provider schema is not available
+        schemas = tuple(getattr(func, attr, None) or func.tool for func in self._tools.values())
 
-        self._schema_cache[provider] = schemas
-        logger.debug(f"Built schema cache for provider {provider} with {len(schemas)} tools")
+        self._schema_cache[provider] = (self._version, schemas)
+        logger.debug("Built schema cache for provider %s with %d tools", provider, len(schemas))
 
-    def get_all(self) -> Dict[str, ToolFunction]:
+    def get_all(self) -> Mapping[str, ToolFunction]:
         """
         Get all registered tools.
         
         Returns:
-            Dictionary of tool names to tool functions
+            Read-only view of tool names to tool functions
         """
-        return self._tools
+        return MappingProxyType(self._tools)
 
     def get_names(self) -> List[str]:
         """
@@ -333,19 +431,39 @@ class ToolRegistry:
             provider: Optional provider name, if None clears all caches
         """
         if provider:
-            if provider in self._schema_cache:
-                self._schema_cache[provider] = []
-                self._cache_valid[provider] = False
+            self._schema_cache.pop(provider, None)
+            self._schema_json_cache.pop(provider, None)
         else:
             self._schema_cache = {}
-            self._cache_valid = {}
+            self._schema_json_cache = {}
+
+        logger.debug("Cleared schema cache for %s", provider if provider else 'all providers')
+
+    def copy(self) -> 'ToolRegistry':
+        """
+        Create an independent registry with the same tools.
+
+        Cached schemas are immutable, so the copy reuses them instead of rebuilding them.
 
-        logger.debug(f"Cleared schema cache for {provider if provider else 'all providers'}")
+        Returns:
+            A new registry that can be changed without affecting this one
+        """
+        clone = ToolRegistry(set(self._internal_tool_types))
+        clone._tools = dict(self._tools)
+        clone._version = self._version
+        clone._schema_cache = dict(self._schema_cache)
+        clone._schema_json_cache = dict(self._schema_json_cache)
+        clone._cacheable = set(self._cacheable)
+        clone._async_tools = set(self._async_tools)
+        return clone
+
+    __copy__ = copy
 
     async def execute_tool(self, name: str, args: Dict[str, Any]) -> Any:
         """
         Execute a tool by name with the given arguments.
-        Supports both synchronous and asynchronous tool functions.
+        Supports both synchronous and asynchronous tool functions. Tools registered as cacheable
+        return a recent result for identical arguments instead of running again.
 
         Args:
             name: Tool name
@@ -359,21 +477,74 @@ class ToolRegistry:
             ValueError: If tool is an internal tool that should be handled by the LLM provider
             Exception: If tool execution fails
         """
-        if not self.has_tool(name):
-            raise KeyError(f"Tool '{name}' not registered")
+        # A single dict lookup both checks registration and fetches the function
+        try:
+            func = self._tools[name]
+        except KeyError:
+            raise KeyError(f"Tool '{name}' not registered") from None
+
+        # Reuse a recent result of a cacheable tool called with the same arguments
+        cache_key = None
+        if name in self._cacheable:
+            try:
+                cache_key = (func, json.dumps(args, sort_keys=True))
+            except (TypeError, ValueError):
+                pass  # Arguments that can't be serialized are never cached
+            else:
+                cached = self._result_cache.get(cache_key)
+                if cached is not None and time.monotonic() - cached[0] < _RESULT_CACHE_TTL:
+                    logger.info("Using cached result for tool %s", name)
+                    # Each caller gets its own copy, so changing one result can't affect later calls
+                    return copy.deepcopy(cached[1])
 
-        func = self.get(name)
-        logger.info(f"Executing tool {name} with args: {args}")
+        logger.info("Executing tool %s with args: %s", name, args)
 
         try:
             # Call the function with the provided arguments
             result = func(**args)
 
-            # If the result is a coroutine (async function), await it
-            if inspect.iscoroutine(result):
+            # Async tools are known from registration
+            if name in self._async_tools:
                 result = await result
-
-            return result
         except Exception as e:
-            logger.error(f"Error executing tool {name}: {str(e)}")
+            logger.error("Error executing tool %s: %s", name, e)
             raise
+
+        if cache_key is not None:
+            try:
+                cached_result = copy.deepcopy(result)
+            except Exception:
+                return result  # Results that can't be copied are never cached
+            self._result_cache[cache_key] = (time.monotonic(), cached_result)
+            self._result_cache.move_to_end(cache_key)
+            if len(self._result_cache) > _RESULT_CACHE_MAXSIZE:
+                self._result_cache.popitem(last=False)
+
+        return result
+
+    async def execute_tools_batch(
+            self,
+            calls: List[Tuple[str, Dict[str, Any]]],
+            return_exceptions: bool = False
+    ) -> List[Any]:
+        """
+        Execute several independent tool calls concurrently.
+
+        Synchronous tools run as they are dispatched; asynchronous tools are awaited together.
+
+        Args:
+            calls: (name, args) pairs, e.g. the parallel tool calls from one model turn
+            return_exceptions: Whether to return exceptions in place of results instead of raising
+                the first one
+
+        Returns:
+            Results in the same order as the calls
+
+        Raises:
+            KeyError: If a tool is not registered and return_exceptions is False
+            Exception: If a tool execution fails and return_exceptions is False
+        """
+        return list(await asyncio.gather(
+            *(self.execute_tool(name, args) for name, args in calls),
+            return_exceptions=return_exceptions
+        ))
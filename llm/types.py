@@ -1,9 +1,12 @@
+from dataclasses import dataclass
 from typing import Optional, TypedDict, Literal, List, Dict, Any, Callable
 
 # Type for stream handler callback function
 StreamHandler = Callable[[str], Any]
 
 
+# Messages and responses are plain dicts at runtime: callers build, index and JSON-serialize them
+# directly, so they stay TypedDicts rather than dataclasses
 class Message(TypedDict):
     """Structure for a single message in a conversation."""
     role: Literal["user", "assistant", "system", "developer", "tool"]
@@ -17,6 +20,24 @@ class ToolCallResponse(TypedDict):
     output: str
 
 
+@dataclass(frozen=True)
+class ToolInfo:
+    """Tool call information extracted from any provider's tool call object."""
+    __slots__ = ('id', 'name', 'type', 'arguments')
+
+    id: Optional[str]
+    name: Optional[str]
+    type: Optional[str]
+    arguments: Optional[str]
+
+    def __getitem__(self, key: str) -> Optional[str]:
+        """Allow dict-style access for code written against the previous dict return value."""
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+
 class LLMResponse(TypedDict):
     """Type definition for the LLM response object."""
     text: str
@@ -36,5 +36,9 @@ setup(
         "openai>=1.28.0",
         "python-dotenv>=1.0.0"
     ],
+    extras_require={
+        "tokens": ["tiktoken>=0.5.0"],
+        "json": ["orjson>=3.6.0"],
+    },
     keywords="llm, openai, anthropic, gpt, claude, ai, machine learning, ollama",
 )
@@ -114,7 +114,6 @@ def test_format_tools_for_anthropic():
     assert result[0]["input_schema"]["properties"]["location"]["type"] == "string"
 
 
-@pytest.mark.asyncio
 async def test_anthropic_api_basic_response(mock_anthropic_client, mock_tool_registry):
     """Test basic response from Anthropic API without tool use."""
     # Configure the mock to return a simple text response
@@ -140,7 +139,6 @@ async def test_anthropic_api_basic_response(mock_anthropic_client, mock_tool_reg
     assert result["response_id"] == "msg_123456"
 
 
-@pytest.mark.asyncio
 async def test_anthropic_api_with_tool_use(mock_anthropic_client, mock_tool_registry):
     """Test Anthropic API with tool use."""
     # Configure the mock to return a response with tool use
@@ -197,7 +195,6 @@ async def test_anthropic_api_with_tool_use(mock_anthropic_client, mock_tool_regi
     assert mock_anthropic_client.messages.create.call_count == 2
 
 
-@pytest.mark.asyncio
 async def test_anthropic_api_with_error_handling(mock_anthropic_client, mock_tool_registry):
     """Test error handling in Anthropic API calls."""
     # Make the first API call fail with an "Invalid model name" error
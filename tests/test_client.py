@@ -4,7 +4,8 @@ Tests for the AsyncLLMClient
 @author: skitsanos
 """
 
-import json
+import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -12,55 +13,110 @@ import pytest
 from llm import AsyncLLMClient, ToolRegistry, llm_tool
 
 
-@pytest.fixture
-def mock_openai_client():
-    """Create a mock OpenAI client."""
-    mock_client = AsyncMock()
-    mock_completion = AsyncMock()
-    mock_choice = MagicMock()
-    mock_message = MagicMock()
+_TOOL_ARGS_JSON = '{"param": "test"}'
 
-    mock_message.content = "This is a test response"
-    mock_message.tool_calls = []
 
-    mock_choice.message = mock_message
+def _completion(text, prompt_tokens, completion_tokens, tool_calls=()):
+    """Build a minimal Chat Completions response object."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text, tool_calls=list(tool_calls)))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
 
-    mock_completion.choices = [mock_choice]
-    mock_completion.usage.prompt_tokens = 10
-    mock_completion.usage.completion_tokens = 20
 
-    mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
+class _AsyncStub:
+    """Async callable that records its calls; a lightweight stand-in for AsyncMock."""
 
-    return mock_client
+    def __init__(self, return_value):
+        self.return_value = return_value
+        self.call_args_list = []
+        self._side_effect = None
 
+    @property
+    def side_effect(self):
+        return self._side_effect
 
-@pytest.fixture
-def mock_anthropic_client():
-    """Create a mock Anthropic client."""
+    @side_effect.setter
+    def side_effect(self, responses):
+        # Like AsyncMock, an iterable side effect returns one item per call
+        self._side_effect = iter(responses) if responses is not None else None
+
+    @property
+    def call_count(self):
+        return len(self.call_args_list)
+
+    @property
+    def call_args(self):
+        return self.call_args_list[-1] if self.call_args_list else None
+
+    async def __call__(self, *args, **kwargs):
+        self.call_args_list.append((args, kwargs))
+        if self._side_effect is not None:
+            return next(self._side_effect)
+        return self.return_value
+
+    def assert_called_once(self):
+        assert self.call_count == 1, f"Expected one call, got {self.call_count}"
+
+    def reset_mock(self):
+        self.call_args_list = []
+
+
+# Responses for a tool round: a call to example_tool, then the final answer
+_TOOL_CALL = SimpleNamespace(
+    id="call_123",
+    type="function",
+    function=SimpleNamespace(name="example_tool", arguments=_TOOL_ARGS_JSON),
+)
+_TOOL_FIRST_RESP = _completion("I'll use a tool", 10, 20, tool_calls=[_TOOL_CALL])
+_TOOL_SECOND_RESP = _completion("Here's the result: Tool response: test", 30, 40)
+
+
+@pytest.fixture(scope="session")
+def mock_openai_client():
+    """Create a mock OpenAI client."""
     mock_client = AsyncMock()
-    mock_message = AsyncMock()
-    mock_content = MagicMock()
+    mock_client.chat.completions.create = _AsyncStub(_completion("This is a test response", 10, 20))
+
+    return mock_client
 
-    mock_content.type = "text"
-    mock_content.text = "This is a test response from Claude"
 
-    mock_message.content = [mock_content]
-    mock_message.usage.input_tokens = 15
-    mock_message.usage.output_tokens = 25
+@pytest.fixture(scope="session")
+def mock_anthropic_client():
+    """Create a mock Anthropic client."""
+    mock_message = SimpleNamespace(
+        id="msg_123",
+        content=[SimpleNamespace(type="text", text="This is a test response from Claude")],
+        usage=SimpleNamespace(input_tokens=15, output_tokens=25),
+    )
 
-    mock_client.messages.create = AsyncMock(return_value=mock_message)
+    mock_client = AsyncMock()
+    mock_client.messages.create = _AsyncStub(mock_message)
 
     return mock_client
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def llm_client(mock_openai_client, mock_anthropic_client):
-    """Create an LLMClient with mocked API clients."""
-    with patch("llm.client.AsyncOpenAI", return_value=mock_openai_client), patch(
-            "llm.client.AsyncAnthropic", return_value=mock_anthropic_client
+    """Create an LLMClient with mocked API clients, shared by all tests."""
+    # The API clients are only created in the constructor, so the patches aren't needed afterwards.
+    # Keeping them active for the session would also hand the mocks to unrelated clients.
+    with patch.multiple(
+            "llm.client",
+            AsyncOpenAI=MagicMock(return_value=mock_openai_client),
+            AsyncAnthropic=MagicMock(return_value=mock_anthropic_client),
     ):
-        client = AsyncLLMClient(api_key="test-key")
-        yield client
+        return AsyncLLMClient(api_key="test-key")
+
+
+@pytest.fixture(autouse=True)
+def reset_clients(llm_client, mock_openai_client, mock_anthropic_client):
+    """Reset the shared mocks and client state between tests."""
+    yield
+    for create in (mock_openai_client.chat.completions.create, mock_anthropic_client.messages.create):
+        create.reset_mock()
+        create.side_effect = None
+    llm_client.tool_registry = ToolRegistry()
 
 
 # Define a test tool function
@@ -70,43 +126,28 @@ def example_tool(param: str) -> str:
     return f"Tool response: {param}"
 
 
-@pytest.mark.asyncio
-async def test_openai_response(llm_client, mock_openai_client):
-    """Test getting a response from OpenAI."""
-    response = await llm_client.response(
-        "This is a test",
-        model="gpt-4o-mini",
-        use_responses_api=False,  # Use chat completions API for this test
-    )
-
-    # Verify the client was called with correct parameters
-    mock_openai_client.chat.completions.create.assert_called_once()
-    call_args = mock_openai_client.chat.completions.create.call_args[1]
-    assert call_args["model"] == "gpt-4o-mini"
-    assert call_args["messages"][0]["role"] == "user"
-    assert call_args["messages"][0]["content"] == "This is a test"
-
-    # Verify the response format
-    assert isinstance(response, dict)
-    assert "text" in response
-    assert "input_tokens" in response
-    assert "output_tokens" in response
-    assert response["text"] == "This is a test response"
-    assert response["input_tokens"] == 10
-    assert response["output_tokens"] == 20
-
+@pytest.mark.parametrize("model, expected_text, input_tokens, output_tokens", [
+    ("gpt-4o-mini", "This is a test response", 10, 20),
+    ("claude-3-opus-20240229", "This is a test response from Claude", 15, 25),
+])
+async def test_provider_response(llm_client, mock_openai_client, mock_anthropic_client,
+                                 model, expected_text, input_tokens, output_tokens):
+    """Test getting a response from OpenAI and Anthropic."""
+    create = {
+        "gpt": mock_openai_client.chat.completions.create,
+        "claude": mock_anthropic_client.messages.create,
+    }[model.split("-", 1)[0]]
 
-@pytest.mark.asyncio
-async def test_anthropic_response(llm_client, mock_anthropic_client):
-    """Test getting a response from Anthropic."""
     response = await llm_client.response(
-        "This is a test", model="claude-3-opus-20240229"
+        "This is a test",
+        model=model,
+        use_responses_api=False,  # Use chat completions API for OpenAI models
     )
 
     # Verify the client was called with correct parameters
-    mock_anthropic_client.messages.create.assert_called_once()
-    call_args = mock_anthropic_client.messages.create.call_args[1]
-    assert call_args["model"] == "claude-3-opus-20240229"
+    create.assert_called_once()
+    call_args = create.call_args[1]
+    assert call_args["model"] == model
     assert call_args["messages"][0]["role"] == "user"
     assert call_args["messages"][0]["content"] == "This is a test"
 
@@ -115,12 +156,11 @@ async def test_anthropic_response(llm_client, mock_anthropic_client):
     assert "text" in response
     assert "input_tokens" in response
     assert "output_tokens" in response
-    assert response["text"] == "This is a test response from Claude"
-    assert response["input_tokens"] == 15
-    assert response["output_tokens"] == 25
+    assert response["text"] == expected_text
+    assert response["input_tokens"] == input_tokens
+    assert response["output_tokens"] == output_tokens
 
 
-@pytest.mark.asyncio
 async def test_invalid_model(llm_client):
     """Test response with an invalid model."""
     # Our updated code now defaults to OpenAI for unrecognized models with a warning
@@ -132,7 +172,6 @@ async def test_invalid_model(llm_client):
     assert "text" in response
 
 
-@pytest.mark.asyncio
 async def test_with_instructions(llm_client, mock_openai_client):
     """Test response with system instructions."""
     await llm_client.response(
@@ -151,7 +190,6 @@ async def test_with_instructions(llm_client, mock_openai_client):
     assert messages[1]["role"] == "user"
 
 
-@pytest.mark.asyncio
 async def test_with_message_list(llm_client, mock_openai_client):
     """Test response with a list of messages."""
     messages = [
@@ -173,7 +211,6 @@ async def test_with_message_list(llm_client, mock_openai_client):
     assert passed_messages[3]["role"] == "user"
 
 
-@pytest.mark.asyncio
 async def test_with_tools(llm_client, mock_openai_client):
     """Test response with tools."""
     # Create a registry with a test tool
@@ -181,33 +218,8 @@ async def test_with_tools(llm_client, mock_openai_client):
     registry.register("example_tool", example_tool)
     llm_client.tool_registry = registry
 
-    # Setup mock for tool calls
-    mock_tool_call = MagicMock()
-    mock_tool_call.id = "call_123"
-    mock_tool_call.function.name = "example_tool"
-    mock_tool_call.function.arguments = json.dumps({"param": "test"})
-
     # Configure the mock to return different responses for each call
-    first_response = MagicMock()
-    first_response.choices = [MagicMock()]
-    first_response.choices[0].message.content = "I'll use a tool"
-    first_response.choices[0].message.tool_calls = [mock_tool_call]
-    first_response.usage.prompt_tokens = 10
-    first_response.usage.completion_tokens = 20
-
-    second_response = MagicMock()
-    second_response.choices = [MagicMock()]
-    second_response.choices[0].message.content = (
-        "Here's the result: Tool response: test"
-    )
-    second_response.choices[0].message.tool_calls = []
-    second_response.usage.prompt_tokens = 30
-    second_response.usage.completion_tokens = 40
-
-    mock_openai_client.chat.completions.create.side_effect = [
-        first_response,
-        second_response,
-    ]
+    mock_openai_client.chat.completions.create.side_effect = [_TOOL_FIRST_RESP, _TOOL_SECOND_RESP]
 
     # Call with tools
     response = await llm_client.response(
@@ -221,3 +233,82 @@ async def test_with_tools(llm_client, mock_openai_client):
 
     # Verify the client was called twice (with tool calls and with tool results)
     assert mock_openai_client.chat.completions.create.call_count == 2
+
+
+async def _start_models_server(connections):
+    """Start a keep-alive HTTP server answering every request with an empty model list."""
+    body = b'{"object": "list", "data": []}'
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+                )
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass  # Client closed the connection
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def test_clients_for_the_same_endpoint_share_connections():
+    """Separate clients for one endpoint reuse a connection, even after one of them is closed."""
+    connections = []
+    server = await _start_models_server(connections)
+    base_url = "http://127.0.0.1:%d/v1" % server.sockets[0].getsockname()[1]
+    first = AsyncLLMClient(base_url=base_url, api_key="test-key")
+    second = AsyncLLMClient(base_url=base_url, api_key="test-key")
+
+    try:
+        await first.openai_client.models.list()
+        await second.openai_client.models.list()
+        await first.openai_client.close()
+        await second.openai_client.models.list()
+
+        assert len(connections) == 1
+    finally:
+        await second.openai_client.close()
+        for writer in connections:
+            writer.close()
+        server.close()
+
+
+async def test_shared_connections_work_across_event_loops():
+    """A client keeps working when used from successive event loops."""
+    connections = []
+    server = await _start_models_server(connections)
+    base_url = "http://127.0.0.1:%d/v1" % server.sockets[0].getsockname()[1]
+    client = AsyncLLMClient(base_url=base_url, api_key="test-key")
+
+    async def list_models():
+        await client.openai_client.models.list()
+
+    def list_models_twice():
+        asyncio.run(list_models())
+        asyncio.run(list_models())
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, list_models_twice)
+
+        assert len(connections) == 2
+    finally:
+        for writer in connections:
+            writer.close()
+        server.close()
+
+
+async def test_closing_one_client_leaves_others_open():
+    """Closing one LLM client's OpenAI client doesn't close the connections of another."""
+    first = AsyncLLMClient(api_key="test-key")
+    second = AsyncLLMClient(base_url="http://localhost:11434/v1", api_key="other-key")
+
+    try:
+        await first.openai_client.close()
+
+        assert first.openai_client.is_closed()
+        assert not second.openai_client.is_closed()
+    finally:
+        await second.openai_client.close()
@@ -20,6 +20,13 @@ class TestImport(unittest.TestCase):
         except ImportError:
             self.fail("Failed to import from llm")
 
+    def test_import_symbols(self):
+        """Test that the public API is exported from the package"""
+        import llm
+
+        for name in llm.__all__:
+            self.assertTrue(hasattr(llm, name), f"llm.{name} is missing")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the API request limiter
+
+@author: skitsanos
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from llm.rate_limit import ApiLimiter, _env_int
+
+
+async def test_limiter_caps_concurrent_requests():
+    """No more than max_concurrency requests run at once."""
+    limiter = ApiLimiter(max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def request():
+        nonlocal running, peak
+        async with limiter:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(request() for _ in range(6)))
+
+    assert peak == 2
+
+
+async def test_limiter_waits_for_rate_budget():
+    """Once the per-minute budget is used up, the next request waits for a refill."""
+    limiter = ApiLimiter(max_concurrency=8, max_rpm=1)
+
+    async with limiter:
+        pass
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.__aenter__(), timeout=0.05)
+
+
+def test_limiter_keeps_one_semaphore_per_loop():
+    """Requests on concurrent loops in different threads release the semaphore they acquired."""
+    limiter = ApiLimiter(max_concurrency=1)
+    entered = threading.Barrier(2)
+
+    async def request():
+        async with limiter:
+            semaphore = limiter._get_semaphore()
+            await asyncio.get_running_loop().run_in_executor(None, entered.wait, 1)
+        return semaphore
+
+    semaphores = []
+    threads = [threading.Thread(target=lambda: semaphores.append(asyncio.run(request()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(semaphores) == 2
+    assert semaphores[0] is not semaphores[1]
+    assert all(not semaphore.locked() for semaphore in semaphores)
+
+
+def test_invalid_env_setting_falls_back_to_default(monkeypatch):
+    """An invalid limit in the environment is ignored instead of failing at import time."""
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "lots")
+    assert _env_int("LLM_MAX_CONCURRENCY", 8) == 8
+
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "4")
+    assert _env_int("LLM_MAX_CONCURRENCY", 8) == 4
@@ -0,0 +1,147 @@
+"""
+Tests for the OpenAI Responses API handler
+
+@author: skitsanos
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import llm.responses_api
+from llm.responses_api import handle_responses_api
+from llm.tool_handling import prepare_tools_for_api
+from llm.tooling import ToolRegistry, llm_tool
+
+
+@llm_tool
+def lookup(query: str) -> dict:
+    """Look something up."""
+    return {"answer": f"result for {query}"}
+
+
+def _response(response_id, output, text=""):
+    """Build a minimal Responses API response object."""
+    return SimpleNamespace(
+        id=response_id,
+        output=output,
+        output_text=text,
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5),
+    )
+
+
+def _function_call(call_id, name, arguments):
+    """Build a function_call output item."""
+    return SimpleNamespace(type="function_call", call_id=call_id, name=name, arguments=arguments)
+
+
+@pytest.fixture
+def registry():
+    """Create a registry with a single lookup tool."""
+    return ToolRegistry().register("lookup", lookup)
+
+
+async def test_tool_round_prepares_tools_once(registry):
+    """Tools are formatted once and reused for every tool round."""
+    client = AsyncMock()
+    client.responses.create = AsyncMock(side_effect=[
+        _response("resp_1", [_function_call("call_1", "lookup", '{"query": "x"}')]),
+        _response("resp_2", [], text="Done"),
+    ])
+
+    with patch.object(llm.responses_api, "prepare_tools_for_api", wraps=prepare_tools_for_api) as prepare:
+        result = await handle_responses_api(
+            client=client,
+            tool_registry=registry,
+            user_input=[{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Find x"}],
+            model="gpt-4o-mini",
+            instructions="Ignored because a system message is present",
+            tools=registry.get_schemas("openai"),
+            temperature=0.0,
+            max_tokens=100,
+        )
+
+    assert prepare.call_count == 1
+    assert result["text"] == "Done"
+    assert client.responses.create.call_count == 2
+
+    first_call, second_call = (call[1] for call in client.responses.create.call_args_list)
+    assert first_call["tools"][0]["name"] == "lookup"
+    assert "parameters" in first_call["tools"][0]
+    assert second_call["tools"] is first_call["tools"]
+    assert "instructions" not in first_call
+    assert second_call["previous_response_id"] == "resp_1"
+    assert second_call["input"][-1] == {
+        "type": "function_call_output",
+        "call_id": "call_1",
+        "output": '{"answer": "result for x"}',
+    }
+
+
+async def test_parallel_function_calls_run_concurrently():
+    """Function calls from one response run concurrently and keep their order in the tool outputs."""
+    started = []
+    all_started = asyncio.Event()
+
+    @llm_tool
+    async def wait_for_peers(name: str) -> str:
+        """Wait until both calls have started."""
+        started.append(name)
+        if len(started) == 2:
+            all_started.set()
+        await asyncio.wait_for(all_started.wait(), timeout=1)
+        return f"done {name}"
+
+    registry = ToolRegistry().register("wait_for_peers", wait_for_peers)
+    client = AsyncMock()
+    client.responses.create = AsyncMock(side_effect=[
+        _response("resp_1", [
+            _function_call("call_a", "wait_for_peers", '{"name": "a"}'),
+            _function_call("call_b", "wait_for_peers", '{"name": "b"}'),
+        ]),
+        _response("resp_2", [], text="Both done"),
+    ])
+
+    result = await handle_responses_api(
+        client=client,
+        tool_registry=registry,
+        user_input="Run both",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+    )
+
+    assert result["text"] == "Both done"
+    follow_up_input = client.responses.create.call_args_list[1][1]["input"]
+    assert [item["output"] for item in follow_up_input[1:]] == ["done a", "done b"]
+    assert [item["call_id"] for item in follow_up_input[1:]] == ["call_a", "call_b"]
+
+
+async def test_tool_rounds_stop_at_max_depth(registry):
+    """Tool rounds stop at max_tool_call_depth and the last response is returned as is."""
+    client = AsyncMock()
+    client.responses.create = AsyncMock(side_effect=[
+        _response(f"resp_{i}", [_function_call(f"call_{i}", "lookup", '{"query": "x"}')], text=f"Round {i}")
+        for i in range(3)
+    ])
+
+    result = await handle_responses_api(
+        client=client,
+        tool_registry=registry,
+        user_input="Keep looking",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        max_tool_call_depth=1,
+    )
+
+    assert client.responses.create.call_count == 2
+    assert result["text"] == "Round 1"
+    assert result["response_id"] == "resp_1"
+    assert client.responses.create.call_args[1]["include"] == ["file_search_call.results"]
@@ -0,0 +1,216 @@
+"""
+Tests for streaming responses
+
+@author: skitsanos
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from llm.chat_completions import stream_chat_completions_api
+from llm.stream_buffer import StreamBuffer
+from llm.streaming_responses import stream_responses_api
+from llm.token_counting import count_tokens
+from llm.tooling import ToolRegistry
+
+
+class _Stream:
+    """Async iterator over a fixed list of chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+
+
+def _delta(content):
+    """Build a Chat Completions stream chunk carrying a content delta."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+
+
+def _citation(file_id, filename, index):
+    """Build a file_citation annotation."""
+    return SimpleNamespace(type="file_citation", file_id=file_id, filename=filename, index=index)
+
+
+def _output_with(*annotations):
+    """Build a response output list holding a single message with the given annotations."""
+    return [SimpleNamespace(content=[SimpleNamespace(annotations=list(annotations))])]
+
+
+async def test_stream_responses_deduplicates_citations():
+    """Each (file_id, index) citation is collected once, in first-seen order."""
+    first = _citation("file_1", "a.txt", 0)
+    second = _citation("file_2", "b.txt", 3)
+    chunks = [
+        SimpleNamespace(id="resp_1", output=_output_with(first)),
+        SimpleNamespace(id="resp_1", output=_output_with(first, second)),
+        SimpleNamespace(id="resp_1", output=_output_with(second),
+                        usage=SimpleNamespace(input_tokens=7, output_tokens=3)),
+    ]
+    client = AsyncMock()
+    client.responses.create = AsyncMock(return_value=_Stream(chunks))
+    handler = AsyncMock()
+
+    result = await stream_responses_api(
+        client=client,
+        user_input="Cite your sources",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        stream_handler=handler,
+    )
+
+    assert result["response_id"] == "resp_1"
+    assert result["input_tokens"] == 7
+    assert result["output_tokens"] == 3
+    assert result["sources"] == [
+        {"file_id": "file_1", "filename": "a.txt", "index": 0},
+        {"file_id": "file_2", "filename": "b.txt", "index": 3},
+    ]
+
+
+async def test_stream_responses_skips_citations_on_text_deltas():
+    """Text delta events are not scanned for citations."""
+    chunks = [
+        SimpleNamespace(type="response.output_text.delta", id="resp_1",
+                        output=_output_with(_citation("file_1", "a.txt", 0))),
+        SimpleNamespace(type="response.completed", id="resp_1", output=[]),
+    ]
+    client = AsyncMock()
+    client.responses.create = AsyncMock(return_value=_Stream(chunks))
+
+    result = await stream_responses_api(
+        client=client,
+        user_input="Cite your sources",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        stream_handler=AsyncMock(),
+    )
+
+    assert result["response_id"] == "resp_1"
+    assert result["sources"] == []
+
+
+async def test_stream_chat_completions_counts_missing_usage_locally():
+    """Without usage in the stream, tokens are counted locally instead of with a second API call."""
+    client = AsyncMock()
+    client.chat.completions.create = AsyncMock(return_value=_Stream([_delta("Hello"), _delta(" world")]))
+    handler = AsyncMock()
+
+    result = await stream_chat_completions_api(
+        client=client,
+        tool_registry=ToolRegistry(),
+        user_input="Say hello to the whole world",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        stream_handler=handler,
+    )
+
+    client.chat.completions.create.assert_called_once()
+    assert result["text"] == "Hello world"
+    assert result["input_tokens"] == count_tokens("Say hello to the whole world", "gpt-4o-mini")
+    assert result["output_tokens"] == count_tokens("Hello world", "gpt-4o-mini")
+
+
+async def test_stream_chat_completions_reads_usage_from_final_chunk():
+    """Usage is requested up front and read from the final chunk, which has no choices."""
+    usage_chunk = SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=12, completion_tokens=2))
+    client = AsyncMock()
+    client.chat.completions.create = AsyncMock(return_value=_Stream([_delta("Hi"), usage_chunk]))
+
+    result = await stream_chat_completions_api(
+        client=client,
+        tool_registry=ToolRegistry(),
+        user_input="Greet me",
+        model="gpt-4o-mini",
+        instructions=None,
+        tools=None,
+        temperature=0.0,
+        max_tokens=100,
+        stream_handler=AsyncMock(),
+    )
+
+    call_args = client.chat.completions.create.call_args[1]
+    assert call_args["stream_options"] == {"include_usage": True}
+    assert result["input_tokens"] == 12
+    assert result["output_tokens"] == 2
+
+
+async def test_stream_buffer_flushes_first_chunk_then_coalesces():
+    """The first chunk goes out immediately; later chunks are batched until a threshold is hit."""
+    received = []
+    buffer = StreamBuffer(received.append, flush_chars=10, flush_ms=60_000)
+
+    for text in ["He", "llo", " wo", "rld", "!!!!!"]:
+        await buffer.write(text)
+    assert received == ["He", "llo world!!!!!"]
+
+    await buffer.write("?")
+    await buffer.flush()
+    await buffer.flush()
+    assert received == ["He", "llo world!!!!!", "?"]
+
+
+async def test_stream_buffer_flushes_on_timer_without_new_chunks():
+    """Buffered text is flushed flush_ms after the previous flush even if the stream stalls."""
+    received = []
+    buffer = StreamBuffer(received.append, flush_chars=10, flush_ms=20)
+
+    await buffer.write("He")
+    await buffer.write("llo")
+    assert received == ["He"]
+
+    await asyncio.sleep(0.1)
+    assert received == ["He", "llo"]
+
+    await buffer.flush()
+    assert received == ["He", "llo"]
+
+
+async def test_stream_error_cancels_pending_flush():
+    """When the stream fails, text held for a timed flush is not sent after the error is raised."""
+    client = AsyncMock()
+    client.chat.completions.create = AsyncMock(
+        return_value=_Stream([_delta("He"), _delta("llo"), ConnectionError("stream dropped")])
+    )
+    received = []
+
+    with pytest.raises(ConnectionError):
+        await stream_chat_completions_api(
+            client=client,
+            tool_registry=ToolRegistry(),
+            user_input="Say hello",
+            model="gpt-4o-mini",
+            instructions=None,
+            tools=None,
+            temperature=0.0,
+            max_tokens=100,
+            stream_handler=received.append,
+            flush_chars=10,
+            flush_ms=20,
+        )
+
+    await asyncio.sleep(0.1)
+    assert received == ["He"]
@@ -0,0 +1,284 @@
+"""
+Tests for provider-specific tool formatting and tool call handling
+
+@author: skitsanos
+"""
+
+import asyncio
+import copy
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import llm.tool_handling
+from llm.tool_handling import (
+    create_shortened_tool_ids,
+    extract_tool_info,
+    prepare_tools_for_api,
+    prepare_tools_for_api_lazy,
+    process_function_calls,
+)
+from llm.tooling import ToolRegistry, llm_tool
+from llm.types import ToolInfo
+
+OPENAI_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "lookup",
+        "description": "Look something up",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"]
+        }
+    }
+}
+
+
+def _tool_call(call_id, name, arguments):
+    """Build a Responses API function call."""
+    return SimpleNamespace(type="function_call", call_id=call_id, name=name, arguments=arguments)
+
+
+def test_prepare_tools_reuses_cached_format():
+    """Tools are formatted once per API type; each call gets its own copy of the result."""
+    llm.tool_handling._FORMAT_CACHE.clear()
+    tools = (OPENAI_TOOL,)
+
+    prep_responses = MagicMock(wraps=llm.tool_handling._prep_responses)
+    prep_completions = MagicMock(wraps=llm.tool_handling._prep_completions)
+    with patch.dict(llm.tool_handling._DISPATCH, responses=prep_responses, completions=prep_completions):
+        first = prepare_tools_for_api(tools, "responses")
+        first.append({"type": "web_search"})
+        second = prepare_tools_for_api(tools, "responses")
+        prepare_tools_for_api(tools, "completions")
+        assert prep_responses.call_count == 1
+        assert prep_completions.call_count == 1
+
+        # Lists are cached by the tools they contain
+        prepare_tools_for_api([OPENAI_TOOL], "responses")
+        prepare_tools_for_api([OPENAI_TOOL], "responses")
+        prepare_tools_for_api([dict(OPENAI_TOOL)], "responses")
+        assert prep_responses.call_count == 3
+
+    assert second == [{
+        "type": "function",
+        "name": "lookup",
+        "description": "Look something up",
+        "parameters": OPENAI_TOOL["function"]["parameters"],
+    }]
+
+
+def test_prepare_anthropic_tools_marks_last_tool_for_caching():
+    """Only the last Anthropic tool gets the cache_control breakpoint, without changing the input."""
+    second_tool = {"name": "other", "description": "Other tool", "input_schema": {"type": "object"}}
+
+    tools = prepare_tools_for_api([OPENAI_TOOL, second_tool], "anthropic")
+
+    assert "cache_control" not in tools[0]
+    assert tools[1]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in second_tool
+
+
+async def test_process_function_calls_runs_tools_concurrently():
+    """Tool calls run concurrently and their responses keep the call order, including errors."""
+    started = []
+    all_started = asyncio.Event()
+
+    @llm_tool
+    async def wait_for_peers(name: str) -> str:
+        """Wait until both calls have started."""
+        started.append(name)
+        if len(started) == 2:
+            all_started.set()
+        await asyncio.wait_for(all_started.wait(), timeout=1)
+        return f"done {name}"
+
+    registry = ToolRegistry().register("wait_for_peers", wait_for_peers)
+    calls = [
+        _tool_call("call_a", "wait_for_peers", '{"name": "a"}'),
+        _tool_call("call_b", "missing_tool", "{}"),
+        _tool_call("call_c", "wait_for_peers", "not json"),
+        _tool_call("call_d", "wait_for_peers", '{"name": "d"}'),
+    ]
+
+    responses = await process_function_calls(registry, calls, id_mapping={})
+
+    assert [r["tool_call_id"] for r in responses] == ["call_a", "call_b", "call_c", "call_d"]
+    assert responses[0]["output"] == "done a"
+    assert responses[1]["output"] == "Error: Tool 'missing_tool' not found in registry"
+    assert responses[2]["output"].startswith("Invalid JSON arguments for tool wait_for_peers")
+    assert responses[3]["output"] == "done d"
+
+
+def test_create_shortened_tool_ids_fit_chat_completions_limit():
+    """Each call gets a unique ID that fits the 40-character Chat Completions limit."""
+    calls = [_tool_call(f"fc_{'x' * 60}_{i}", "lookup", "{}") for i in range(3)]
+
+    id_mapping = create_shortened_tool_ids(calls)
+
+    assert list(id_mapping) == [call.call_id for call in calls]
+    assert len(set(id_mapping.values())) == 3
+    assert all(short_id.startswith("call_") and len(short_id) <= 40 for short_id in id_mapping.values())
+
+
+def test_create_shortened_tool_ids_keeps_ids_that_fit():
+    """IDs already within the limit map to themselves; calls without an ID are skipped."""
+    calls = [_tool_call("call_abc", "lookup", "{}"), SimpleNamespace(call_id=None, id=None)]
+
+    assert create_shortened_tool_ids(calls) == {"call_abc": "call_abc"}
+
+
+async def test_process_function_calls_reuses_cacheable_results():
+    """Only tools registered as cacheable reuse results for identical arguments."""
+    calls = []
+
+    @llm_tool
+    def count_calls(query: str) -> dict:
+        """Record each call."""
+        calls.append(query)
+        return {"calls": len(calls)}
+
+    registry = ToolRegistry().register("cached", count_calls, cacheable=True)
+
+    first = await process_function_calls(registry, [_tool_call("call_1", "cached", '{"query": "x"}')], id_mapping={})
+    second = await process_function_calls(registry, [_tool_call("call_2", "cached", '{"query": "x"}')], id_mapping={})
+    assert calls == ["x"]
+    assert second[0] == {"tool_call_id": "call_2", "output": first[0]["output"]}
+
+    registry.register("cached", count_calls)
+    await process_function_calls(registry, [_tool_call("call_3", "cached", '{"query": "x"}')], id_mapping={})
+    assert calls == ["x", "x"]
+
+
+def test_prepare_tools_lazy_sends_full_schemas_only_for_active_tools():
+    """Inactive tools are reduced to a name and one-line description, keeping their order."""
+    summary_tool = {
+        "name": "search",
+        "description": "Search the docs.\nLong explanation that is not sent.",
+        "input_schema": {"type": "object", "properties": {"query": {"type": "string"}}},
+    }
+
+    tools = prepare_tools_for_api_lazy([summary_tool, OPENAI_TOOL], "completions", active_names={"lookup"})
+
+    assert tools == [
+        {
+            "type": "function",
+            "function": {
+                "name": "search",
+                "description": "Search the docs.",
+                "parameters": {"type": "object", "properties": {}},
+            },
+        },
+        OPENAI_TOOL,
+    ]
+
+
+def test_prepare_tools_lazy_reuses_summaries():
+    """Summaries are built once per tool, so repeated lazy calls hit the format cache."""
+    llm.tool_handling._FORMAT_CACHE.clear()
+    tools = [OPENAI_TOOL, {"name": "search", "description": "Search the docs.", "input_schema": {"type": "object"}}]
+
+    prep_completions = MagicMock(wraps=llm.tool_handling._prep_completions)
+    with patch.dict(llm.tool_handling._DISPATCH, completions=prep_completions):
+        first = prepare_tools_for_api_lazy(list(tools), "completions", active_names={"lookup"})
+        second = prepare_tools_for_api_lazy(list(tools), "completions", active_names={"lookup"})
+
+    assert prep_completions.call_count == 1
+    assert second == first
+
+
+def test_compact_schema_drops_annotations_and_empty_values():
+    """Annotation keywords and empty values go; property names and literal values stay."""
+    schema = {
+        "type": "object",
+        "title": "Args",
+        "properties": {
+            "title": {"type": "string", "description": "", "examples": ["x"]},
+            "anything": {},
+            "mode": {"type": "string", "enum": ["a", "b"], "default": None},
+        },
+        "required": [],
+    }
+
+    assert llm.tool_handling._compact_schema(schema) == {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "anything": {},
+            "mode": {"type": "string", "enum": ["a", "b"], "default": None},
+        },
+    }
+
+
+async def test_process_function_calls_parses_arguments_per_call():
+    """Invalid argument blobs fail on their own, even if joined together they would be valid JSON."""
+    seen = []
+
+    @llm_tool
+    def record(path: str = "", x: str = "", cmd: str = "") -> str:
+        """Record the arguments of each call."""
+        seen.append({"path": path, "x": x, "cmd": cmd})
+        return "ok"
+
+    registry = ToolRegistry().register("record", record)
+    calls = [
+        _tool_call("call_1", "record", '{"path": "/tmp/a", "x": "}'),
+        _tool_call("call_2", "record", '{", "path": "/etc/passwd"}, {"cmd": "rm -rf /"}'),
+        _tool_call("call_3", "record", '{"path": "/tmp/b"}'),
+    ]
+
+    responses = await process_function_calls(registry, calls, id_mapping={})
+
+    assert [response["output"].startswith("Invalid JSON arguments") for response in responses] == [True, True, False]
+    assert seen == [{"path": "/tmp/b", "x": "", "cmd": ""}]
+
+
+def test_prepare_tools_passes_through_missing_schemas():
+    """Tools whose parameter schema is None keep it as is instead of failing to format."""
+    completions_tool = {"type": "function", "function": {"name": "ping", "parameters": None}}
+    responses_tool = {"type": "function", "name": "ping", "parameters": None}
+    anthropic_tool = {"name": "ping", "description": "", "input_schema": None}
+
+    assert prepare_tools_for_api([completions_tool], "completions")[0]["function"]["parameters"] is None
+    assert prepare_tools_for_api([responses_tool], "responses")[0]["parameters"] is None
+    assert prepare_tools_for_api([anthropic_tool], "anthropic")[0]["input_schema"] is None
+
+
+def test_extract_tool_info_reads_nested_function():
+    """Chat Completions tool calls take name and arguments from the nested function."""
+    tool_call = SimpleNamespace(
+        id="call_1",
+        type="function",
+        function=SimpleNamespace(name="lookup", arguments='{"query": "x"}'),
+    )
+
+    info = extract_tool_info(tool_call)
+
+    assert info == ToolInfo(id="call_1", name="lookup", type="function", arguments='{"query": "x"}')
+    assert info["name"] == "lookup"
+
+
+def test_prepare_anthropic_tools_uses_predefined_schemas():
+    """Predefined tool names get their shared schema, which formatting never modifies."""
+    original = copy.deepcopy(llm.tool_handling._WEATHER_SCHEMA)
+
+    tools = prepare_tools_for_api([{"name": "get_weather", "parameters": {}}], "anthropic")
+
+    assert tools[0]["input_schema"] == original["input_schema"]
+    assert llm.tool_handling._WEATHER_SCHEMA == original
+
+
+def test_prepare_tools_fast_path_matches_general_path():
+    """Tools already in the target format come out the same as when mixed with other formats."""
+    responses_tool = prepare_tools_for_api([OPENAI_TOOL], "responses")[0]
+    responses_tool["parameters"]["title"] = "Args"
+    anthropic_tool = {"name": "other", "description": "", "input_schema": {"type": "object"}}
+
+    native = prepare_tools_for_api([responses_tool], "responses")
+    mixed = prepare_tools_for_api([responses_tool, anthropic_tool], "responses")
+    assert native == mixed[:1]
+    assert "title" not in native[0]["parameters"]
+
+    native = prepare_tools_for_api([OPENAI_TOOL], "completions")
+    mixed = prepare_tools_for_api([OPENAI_TOOL, anthropic_tool], "completions")
+    assert native == mixed[:1] == [OPENAI_TOOL]
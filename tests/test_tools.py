@@ -4,6 +4,10 @@ Tests for the tool registry and llm_tool decorator
 @author: skitsanos
 """
 
+import asyncio
+import copy
+import functools
+import json
 from typing import Any, Dict
 
 import pytest
@@ -36,6 +40,15 @@ async def example_async_tool(param1: str, param2: int = 42) -> Dict[str, Any]:
     return {"param1": param1, "param2": param2, "async": True}
 
 
+@pytest.fixture(scope="session")
+def base_registry():
+    """Create a registry with both example tools, shared by tests that don't change it."""
+    registry = ToolRegistry()
+    registry.register("example_tool", example_tool)
+    registry.register("example_async_tool", example_async_tool)
+    return registry
+
+
 def test_tool_registry_init():
     """Test ToolRegistry initialization."""
     registry = ToolRegistry()
@@ -60,17 +73,19 @@ def test_tool_registry_register():
     assert len(registry.get_names()) == 2
 
 
-def test_tool_registry_unregister():
+def test_tool_registry_unregister(base_registry):
     """Test unregistering tools from the registry."""
-    registry = ToolRegistry()
-
-    # Register and then unregister a tool
-    registry.register("example_tool", example_tool)
+    registry = copy.copy(base_registry)
     assert registry.has_tool("example_tool")
 
     registry.unregister("example_tool")
     assert not registry.has_tool("example_tool")
 
+    # The copy is independent of the shared registry
+    assert base_registry.has_tool("example_tool")
+    assert [schema["name"] for schema in registry.get_schemas("openai")] == ["example_async_tool"]
+    assert len(base_registry.get_schemas("openai")) == 2
+
 
 def test_llm_tool_decorator():
     """Test that the llm_tool decorator properly decorates functions."""
@@ -85,30 +100,62 @@ def test_llm_tool_decorator():
     assert "parameters" in example_tool.openai_tool["function"]
 
 
-def test_get_schemas():
-    """Test retrieving tool schemas from the registry."""
-    registry = ToolRegistry()
-    registry.register("example_tool", example_tool)
+def test_llm_tool_reads_parameter_descriptions():
+    """Parameter descriptions come from "name: description" docstring lines."""
+    properties = example_tool.tool["function"]["parameters"]["properties"]
+
+    assert properties["param1"] == {"type": "string", "description": "First parameter"}
+    assert properties["param2"] == {"type": "integer", "description": "Second parameter with default"}
+    assert example_tool.anthropic_tool["input_schema"]["properties"] == properties
+
+
+def test_llm_tool_schemas_have_independent_parameters():
+    """Each schema of a tool has its own equal copy of the parameters."""
+    parameters = example_tool.tool["function"]["parameters"]
+    openai_parameters = example_tool.openai_tool["function"]["parameters"]
+    anthropic_parameters = example_tool.anthropic_tool["input_schema"]
+
+    assert openai_parameters == anthropic_parameters == parameters
+    assert openai_parameters is not parameters and anthropic_parameters is not parameters
+    assert openai_parameters["properties"] is not anthropic_parameters["properties"]
+    assert parameters["required"] == ["param1"]
 
+
+def test_llm_tool_schemas_are_plain_json():
+    """Schemas can be serialized and copied like any other JSON data; the tool map is read-only."""
+    registry = ToolRegistry().register("example_tool", example_tool)
+
+    for schema in (example_tool.openai_tool, example_tool.anthropic_tool, example_tool.tool):
+        assert json.loads(json.dumps(schema)) == schema
+        assert copy.deepcopy(schema) == schema
+    with pytest.raises(TypeError):
+        registry.get_all()["other"] = example_async_tool
+
+
+def test_get_schemas(base_registry):
+    """Test retrieving tool schemas from the registry."""
     # Get OpenAI schemas
-    openai_schemas = registry.get_schemas("openai")
-    assert len(openai_schemas) == 1
+    openai_schemas = base_registry.get_schemas("openai")
+    assert len(openai_schemas) == 2
     assert openai_schemas[0]["name"] == "example_tool"
     assert openai_schemas[0]["type"] == "function"
+    assert openai_schemas[0] is example_tool.openai_tool
 
     # Get Anthropic schemas
-    anthropic_schemas = registry.get_schemas("anthropic")
-    assert len(anthropic_schemas) == 1
+    anthropic_schemas = base_registry.get_schemas("anthropic")
+    assert len(anthropic_schemas) == 2
     assert anthropic_schemas[0]["name"] == "example_tool"
     assert "input_schema" in anthropic_schemas[0]
+    assert anthropic_schemas[0] is example_tool.anthropic_tool
+
+    # Schemas returned by the registry serialize with plain json.dumps
+    assert json.loads(json.dumps(openai_schemas)) == [dict(schema) for schema in openai_schemas]
+    assert json.loads(json.dumps(anthropic_schemas)) == [dict(schema) for schema in anthropic_schemas]
 
 
-@pytest.mark.asyncio
-async def test_execute_tool():
+async def test_execute_tool(base_registry):
     """Test executing a tool from the registry."""
-    registry = ToolRegistry()
-    registry.register("example_tool", example_tool)
-    registry.register("example_async_tool", example_async_tool)
+    registry = base_registry
 
     # Execute a synchronous tool
     result = await registry.execute_tool("example_tool", {"param1": "hello"})
@@ -124,9 +171,126 @@ async def test_execute_tool():
     assert async_result["async"] is True
 
     # Test with missing required parameter should raise an error
-    with pytest.raises(Exception):
+    with pytest.raises(TypeError, match="param1"):
         await registry.execute_tool("example_tool", {})
 
     # Test with non-existent tool should raise KeyError
     with pytest.raises(KeyError):
         await registry.execute_tool("non_existent_tool", {})
+
+
+async def test_execute_tool_awaits_wrapped_async_tools():
+    """Sync wrappers around an async tool are awaited like the tool itself."""
+    @functools.wraps(example_async_tool)
+    def wrapper(**kwargs):
+        return example_async_tool(**kwargs)
+
+    registry = ToolRegistry().register("wrapped", wrapper)
+    result = await registry.execute_tool("wrapped", {"param1": "hello"})
+    assert result["async"] is True
+
+
+async def test_execute_tool_reuses_cacheable_results():
+    """Cacheable tools return a recent result for identical arguments instead of running again."""
+    calls = []
+
+    @llm_tool
+    def count_calls(query: str) -> Dict[str, int]:
+        """Record each call."""
+        calls.append(query)
+        return {"calls": len(calls)}
+
+    registry = ToolRegistry().register("cached", count_calls, cacheable=True)
+    first = await registry.execute_tool("cached", {"query": "x"})
+    assert first == {"calls": 1}
+    first["calls"] = 100  # Changing a result doesn't affect later calls
+    assert await registry.execute_tool("cached", {"query": "x"}) == {"calls": 1}
+    assert await registry.execute_tool("cached", {"query": "y"}) == {"calls": 2}
+
+    registry.register("cached", count_calls)
+    assert await registry.execute_tool("cached", {"query": "x"}) == {"calls": 3}
+
+
+async def test_execute_tools_batch():
+    """Batched calls run concurrently and return results in call order."""
+    all_started = asyncio.Event()
+    started = []
+
+    @llm_tool
+    async def wait_for_peers(name: str) -> str:
+        """Wait until both calls have started."""
+        started.append(name)
+        if len(started) == 2:
+            all_started.set()
+        await asyncio.wait_for(all_started.wait(), timeout=1)
+        return name
+
+    registry = ToolRegistry().register("wait_for_peers", wait_for_peers).register("example_tool", example_tool)
+
+    results = await registry.execute_tools_batch([
+        ("wait_for_peers", {"name": "a"}),
+        ("example_tool", {"param1": "x"}),
+        ("wait_for_peers", {"name": "b"}),
+    ])
+    assert results == ["a", {"param1": "x", "param2": 42}, "b"]
+
+    results = await registry.execute_tools_batch([("missing", {}), ("example_tool", {"param1": "y"})],
+                                                 return_exceptions=True)
+    assert isinstance(results[0], KeyError)
+    assert results[1]["param1"] == "y"
+
+
+def test_get_schemas_json():
+    """Encoded schemas match get_schemas and are re-encoded only after the tools change."""
+    registry = ToolRegistry().register("example_tool", example_tool)
+
+    encoded = registry.get_schemas_json("openai")
+    assert json.loads(encoded) == json.loads(json.dumps(registry.get_schemas("openai")))
+    assert registry.get_schemas_json("openai") is encoded
+
+    registry.register("example_async_tool", example_async_tool)
+    assert [tool["name"] for tool in json.loads(registry.get_schemas_json("openai"))] == [
+        "example_tool", "example_async_tool"
+    ]
+
+
+def test_get_schemas_rebuilds_after_registry_changes():
+    """Schemas are reused until a tool is registered or unregistered."""
+    registry = ToolRegistry()
+    registry.register("example_tool", example_tool)
+
+    first = registry.get_schemas("openai")
+    assert registry.get_schemas("openai") is first
+
+    registry.register("example_async_tool", example_async_tool)
+    assert [schema["name"] for schema in registry.get_schemas("openai")] == ["example_tool", "example_async_tool"]
+
+    registry.unregister("example_tool")
+    assert [schema["name"] for schema in registry.get_schemas("openai")] == ["example_async_tool"]
+    assert [schema["name"] for schema in first] == ["example_tool"]
+
+
+def test_reregistering_a_tool_keeps_its_position():
+    """Replacing a registered tool keeps its place in the schema order."""
+    registry = ToolRegistry()
+    registry.register("example_tool", example_tool)
+    registry.register("example_async_tool", example_async_tool)
+    registry.get_schemas("anthropic")
+
+    registry.register("example_tool", example_async_tool)
+
+    assert registry.get_schemas("anthropic") == (example_async_tool.anthropic_tool,) * 2
+    assert registry.get_names() == ["example_tool", "example_async_tool"]
+
+
+def test_internal_tool_types_snapshot_tracks_changes():
+    """The read-only internal tool types are reused until a new type is added."""
+    registry = ToolRegistry(internal_tool_types={"file_search"})
+
+    types = registry.get_internal_tool_types()
+    assert types == frozenset({"file_search"})
+    assert registry.get_internal_tool_types() is types
+
+    registry.add_internal_tool_type("web_search")
+    assert registry.get_internal_tool_types() == frozenset({"file_search", "web_search"})
+    assert registry.is_internal_tool("web_search")